@@ -0,0 +1,32 @@
+"""Add gathering time index
+
+Revision ID: e1b5c7d9a3f8
+Revises: d4e7a9c2f613
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b5c7d9a3f8'
+down_revision = 'd4e7a9c2f613'
+branch_labels = None
+depends_on = None
+
+GATHERING_SECONDS = {
+    'sqlite': '(julianday(close_date) - julianday(create_date)) * 86400',
+    'postgresql': 'EXTRACT(EPOCH FROM close_date - create_date)',
+}
+
+
+def upgrade():
+    expression = GATHERING_SECONDS[op.get_bind().dialect.name]
+    with op.batch_alter_table('charityproject', schema=None) as batch_op:
+        batch_op.create_index('ix_charityproject_gathering_time', [sa.text(expression), 'id'], unique=False, postgresql_where=sa.text('fully_invested IS true'), sqlite_where=sa.text('fully_invested IS 1'))
+
+
+def downgrade():
+    with op.batch_alter_table('charityproject', schema=None) as batch_op:
+        batch_op.drop_index('ix_charityproject_gathering_time')
@@ -0,0 +1,39 @@
+"""Add create_date server defaults
+
+Revision ID: f3a9c5e7b2d4
+Revises: e1b5c7d9a3f8
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c5e7b2d4'
+down_revision = 'e1b5c7d9a3f8'
+branch_labels = None
+depends_on = None
+
+TABLES = ('charityproject', 'donation', 'investment')
+
+
+def upgrade():
+    # SQLite не поддерживает изменение значения по умолчанию без
+    # пересоздания таблицы, при котором batch-режим теряет частичные
+    # индексы и индексы по выражениям. Приложение заполняет даты
+    # создания само, поэтому в SQLite значение по умолчанию появляется
+    # только у таблиц, созданных заново.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        op.alter_column(
+            table, 'create_date', server_default=sa.text('LOCALTIMESTAMP')
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        op.alter_column(table, 'create_date', server_default=None)
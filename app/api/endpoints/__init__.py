@@ -2,3 +2,4 @@ from app.api.endpoints.user import router as user_router # noqa
 from app.api.endpoints.charity_project import router as charity_project_router # noqa
 from app.api.endpoints.donation import router as donation_router # noqa
 from app.api.endpoints.google_api import router as google_api_router # noqa
+from app.api.endpoints.allocation import router as allocation_router # noqa
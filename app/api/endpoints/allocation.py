@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+
+from app.core.config import settings
+from app.core.user import current_superuser
+from app.schemas.allocation import AllocationQueueMetrics
+from app.services.allocation_queue import allocation_queue
+
+router = APIRouter()
+
+
+@router.get(
+    '/queue',
+    response_model=AllocationQueueMetrics,
+    dependencies=(Depends(current_superuser),)
+)
+async def get_allocation_queue_metrics():
+    """
+    Получить метрики очереди распределения. Только для суперпользователей.
+    """
+    return AllocationQueueMetrics(
+        enabled=settings.allocation_queue,
+        depth=allocation_queue.depth,
+        batches=allocation_queue.batches,
+        allocated=allocation_queue.allocated,
+        last_batch_size=allocation_queue.last_batch_size,
+        max_batch_size=allocation_queue.max_batch_size,
+        failed_batches=allocation_queue.failed_batches,
+    )
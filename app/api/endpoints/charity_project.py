@@ -1,19 +1,40 @@
-from fastapi import APIRouter, Depends
+from codecs import iterdecode
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, File, Header, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.validators import (check_full_amount_ge_invested_amount,
-                                check_name_duplicate, check_project_exists,
+from app.api.listing_cache import cached_listing
+from app.api.ndjson import accepts_ndjson, ndjson_response
+from app.api.pagination import Pagination, get_pagination, make_page
+from app.api.routing import TrustedORMRoute
+from app.api.serialization import RowSerializer, SchemaSerializer
+from app.api.validators import (check_import_format, check_name_unique,
+                                check_project_exists,
                                 check_project_is_not_invested,
-                                check_project_is_opened)
-from app.core.db import get_async_session
+                                check_project_is_updatable)
+from app.core.db import get_async_session, get_read_session
 from app.core.user import current_superuser
-from app.crud import charity_project_crud
+from app.crud import charity_project_crud, investment_crud
+from app.models import CharityProject
 from app.schemas.charity_project import (CharityProjectCreate,
                                          CharityProjectDB,
+                                         CharityProjectImportResult,
                                          CharityProjectUpdate)
-from app.services.investments import invest
+from app.schemas.investment import InvestmentDB
+from app.schemas.page import Page
+from app.services.allocation_queue import schedule_allocation
+from app.services.open_pool import open_pool_index
+from app.services.project_import import import_projects, read_rows
+
+router = APIRouter(route_class=TrustedORMRoute)
 
-router = APIRouter()
+project_serializer = RowSerializer(
+    model=CharityProject, schema=CharityProjectDB, exclude_none=True
+)
+project_page_serializer = SchemaSerializer(
+    schema=CharityProjectDB, exclude_none=True
+)
 
 
 @router.post(
@@ -33,33 +54,114 @@ async def create_charity_project(
     - **description**: Описание проекта.
     - **full_amount**: Требуемая сумма.
     """
-    await check_name_duplicate(
-        project_name=project.name, session=session
-    )
-    new_project = await charity_project_crud.create(
-        obj_in=project, session=session, commit=False
-    )
-    new_project = await invest(allocated=new_project, session=session)
-    await session.commit()
-    await session.refresh(new_project)
+    async with check_name_unique(project_name=project.name, session=session):
+        new_project = await charity_project_crud.create(
+            obj_in=project, session=session, commit=False
+        )
+        new_project, = await schedule_allocation(
+            allocated=[new_project], session=session
+        )
     return new_project
 
 
+@router.post(
+    '/import',
+    response_model=CharityProjectImportResult,
+    dependencies=(Depends(current_superuser),)
+)
+async def import_charity_projects(
+    file: UploadFile = File(...),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Импортировать проекты из файла. Только для суперпользователей.
+
+    Принимается файл .csv с заголовком или .jsonl с объектами
+    по одному на строку. Поля строк те же, что при создании проекта.
+    Строки с ошибками пропускаются и перечисляются в ответе.
+    """
+    import_format = await check_import_format(file.filename)
+    return await import_projects(
+        rows=read_rows(
+            lines=iterdecode(file.file, 'utf-8-sig'),
+            import_format=import_format
+        ),
+        session=session
+    )
+
+
 @router.get(
     '/',
-    response_model_exclude_none=True,
-    response_model=list[CharityProjectDB]
+    response_model=Union[list[CharityProjectDB], Page[CharityProjectDB]]
 )
 async def get_all_charity_projects(
+    pagination: Optional[Pagination] = Depends(get_pagination),
+    ndjson: bool = Depends(accepts_ndjson),
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Получить список всех проектов.
+
+    При передаче limit и/или after возвращается страница списка
+    в порядке создания и курсор следующей страницы.
+    С заголовком Accept: application/x-ndjson полный список
+    передается потоком, по объекту в строке.
+    Полный список отдается с заголовком ETag, при совпадении
+    If-None-Match возвращается 304.
+    """
+    if ndjson:
+        return ndjson_response(
+            rows=charity_project_crud.stream_rows(
+                project_serializer.columns, session
+            ),
+            serializer=project_serializer
+        )
+    if pagination is None:
+        async def render() -> bytes:
+            return project_serializer.render(
+                await charity_project_crud.get_rows(
+                    project_serializer.columns, session
+                )
+            )
+        return await cached_listing(
+            key='charity_project',
+            table=CharityProject.__tablename__,
+            if_none_match=if_none_match,
+            render=render,
+            session=session
+        )
+    return make_page(
+        *await charity_project_crud.get_page(
+            limit=pagination.limit, after=pagination.after, session=session
+        ),
+        serializer=project_page_serializer
+    )
+
+
+@router.get(
+    '/{project_id}/investments',
+    response_model=list[InvestmentDB],
+    dependencies=(Depends(current_superuser),)
+)
+async def get_charity_project_investments(
+    project_id: int,
     session: AsyncSession = Depends(get_async_session)
 ):
-    """Получить список всех проектов."""
-    return await charity_project_crud.get_multi(session)
+    """
+    Получить список пожертвований, вложенных в проект.
+    Только для суперпользователей.
+    """
+    await check_project_exists(project_id=project_id, session=session)
+    return await investment_crud.get_by_project(
+        project_id=project_id, session=session
+    )
 
 
 @router.patch(
     '/{project_id}',
     response_model=CharityProjectDB,
+    response_model_exclude={'allocation_state'},
     dependencies=(Depends(current_superuser),)
 )
 async def partially_update_charity_project(
@@ -75,25 +177,29 @@ async def partially_update_charity_project(
     - **description**: Описание проекта.
     - **full_amount**: Требуемая сумма.
     """
-    project = await check_project_exists(
-        project_id=project_id, session=session
-    )
-    await check_project_is_opened(project)
-    if obj_in.name is not None:
-        await check_name_duplicate(project_name=obj_in.name, session=session)
-    if obj_in.full_amount is not None:
-        await check_full_amount_ge_invested_amount(
-            full_amount=obj_in.full_amount,
-            invested_amount=project.invested_amount
+    async with check_name_unique(project_name=obj_in.name, session=session):
+        project = await charity_project_crud.update_opened(
+            project_id=project_id, obj_in=obj_in, session=session
         )
-    return await charity_project_crud.update(
-        db_obj=project, obj_in=obj_in, session=session
-    )
+        if project is None:
+            project = await check_project_is_updatable(
+                project_id=project_id,
+                project_name=obj_in.name,
+                full_amount=obj_in.full_amount,
+                session=session
+            )
+            return await charity_project_crud.update(
+                db_obj=project, obj_in=obj_in, session=session
+            )
+        open_pool_index.collect(session=session.sync_session, objs=[project])
+        await session.commit()
+    return project
 
 
 @router.delete(
     '/{project_id}',
     response_model=CharityProjectDB,
+    response_model_exclude={'allocation_state'},
     dependencies=(Depends(current_superuser),)
 )
 async def remove_charity_project(
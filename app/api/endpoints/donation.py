@@ -1,14 +1,37 @@
-from fastapi import APIRouter, Depends
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, Header
+from pydantic import conlist
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
+from app.api.listing_cache import cached_listing
+from app.api.ndjson import accepts_ndjson, ndjson_response
+from app.api.pagination import Pagination, get_pagination, make_page
+from app.api.routing import TrustedORMRoute
+from app.api.serialization import RowSerializer, SchemaSerializer
+from app.api.validators import check_donation_exists
+from app.core.config import settings
+from app.core.db import get_async_session, get_read_session
 from app.core.user import current_superuser, current_user
-from app.crud import donation_crud
-from app.models import User
-from app.schemas.donation import DonationCreate, DonationDB, DonationDBFull
-from app.services.investments import invest
+from app.crud import donation_crud, investment_crud
+from app.models import Donation, User
+from app.schemas.donation import (DonationCreate, DonationDB,
+                                  DonationDBFull, DonationSummary,
+                                  DonationUserSummary)
+from app.schemas.investment import InvestmentDB
+from app.schemas.page import Page
+from app.services.allocation_queue import schedule_allocation
+
+router = APIRouter(route_class=TrustedORMRoute)
 
-router = APIRouter()
+donation_serializer = RowSerializer(model=Donation, schema=DonationDB)
+donation_full_serializer = RowSerializer(
+    model=Donation, schema=DonationDBFull, exclude_none=True
+)
+donation_page_serializer = SchemaSerializer(schema=DonationDB)
+donation_full_page_serializer = SchemaSerializer(
+    schema=DonationDBFull, exclude_none=True
+)
 
 
 @router.post(
@@ -30,32 +53,197 @@ async def create_donation(
     new_donation = await donation_crud.create(
         obj_in=donation, session=session, user=user, commit=False
     )
-    new_donation = await invest(allocated=new_donation, session=session)
-    await session.commit()
-    await session.refresh(new_donation)
+    new_donation, = await schedule_allocation(
+        allocated=[new_donation], session=session
+    )
     return new_donation
 
 
+@router.post(
+    '/batch',
+    response_model=list[DonationDB],
+    response_model_exclude_none=True
+)
+async def create_donations_batch(
+    donations: conlist(
+        DonationCreate, max_items=settings.max_donation_batch_size
+    ),
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(current_user)
+):
+    """
+    Сделать несколько пожертвований одним запросом.
+
+    Пожертвования распределяются по проектам за один общий проход
+    и сохраняются одной транзакцией. В пачке не более
+    MAX_DONATION_BATCH_SIZE пожертвований.
+    - **full_amount**: Сумма пожертвования.
+    - **comment**: Комментарий к пожертвованию (опционально).
+    """
+    new_donations = [
+        await donation_crud.create(
+            obj_in=donation, session=session, user=user, commit=False
+        ) for donation in donations
+    ]
+    return await schedule_allocation(
+        allocated=new_donations, session=session
+    )
+
+
 @router.get(
     '/',
-    response_model=list[DonationDBFull],
-    response_model_exclude_none=True,
+    response_model=Union[list[DonationDBFull], Page[DonationDBFull]],
     dependencies=(Depends(current_superuser),)
 )
 async def get_all_donations(
-    session: AsyncSession = Depends(get_async_session)
+    pagination: Optional[Pagination] = Depends(get_pagination),
+    ndjson: bool = Depends(accepts_ndjson),
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_read_session)
 ):
-    """Получить список всех пожертвований. Только для суперпользователей."""
-    return await donation_crud.get_multi(session)
+    """
+    Получить список всех пожертвований. Только для суперпользователей.
+
+    При передаче limit и/или after возвращается страница списка
+    в порядке создания и курсор следующей страницы.
+    С заголовком Accept: application/x-ndjson полный список
+    передается потоком, по объекту в строке.
+    Полный список отдается с заголовком ETag, при совпадении
+    If-None-Match возвращается 304.
+    """
+    if ndjson:
+        return ndjson_response(
+            rows=donation_crud.stream_rows(
+                donation_full_serializer.columns, session
+            ),
+            serializer=donation_full_serializer
+        )
+    if pagination is None:
+        async def render() -> bytes:
+            return donation_full_serializer.render(
+                await donation_crud.get_rows(
+                    donation_full_serializer.columns, session
+                )
+            )
+        return await cached_listing(
+            key='donation',
+            table=Donation.__tablename__,
+            if_none_match=if_none_match,
+            render=render,
+            session=session
+        )
+    return make_page(
+        *await donation_crud.get_page(
+            limit=pagination.limit, after=pagination.after, session=session
+        ),
+        serializer=donation_full_page_serializer
+    )
 
 
 @router.get(
     '/my',
-    response_model=list[DonationDB]
+    response_model=Union[list[DonationDB], Page[DonationDB]]
 )
 async def get_user_donations(
+    pagination: Optional[Pagination] = Depends(get_pagination),
+    ndjson: bool = Depends(accepts_ndjson),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Получить список пожертвований текущего пользователя.
+
+    При передаче limit и/или after возвращается страница списка
+    в порядке создания и курсор следующей страницы.
+    С заголовком Accept: application/x-ndjson полный список
+    передается потоком, по объекту в строке.
+    """
+    if ndjson:
+        return ndjson_response(
+            rows=donation_crud.stream_rows_by_user(
+                columns=donation_serializer.columns,
+                user=user,
+                session=session
+            ),
+            serializer=donation_serializer
+        )
+    if pagination is None:
+        return donation_serializer.response(
+            await donation_crud.get_rows_by_user(
+                columns=donation_serializer.columns,
+                user=user,
+                session=session
+            )
+        )
+    return make_page(
+        *await donation_crud.get_page_by_user(
+            user=user,
+            limit=pagination.limit,
+            after=pagination.after,
+            session=session
+        ),
+        serializer=donation_page_serializer
+    )
+
+
+@router.get(
+    '/my/summary',
+    response_model=DonationSummary
+)
+async def get_user_donations_summary(
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Получить сводку по пожертвованиям текущего пользователя.
+
+    - **count**: Количество пожертвований.
+    - **total_donated**: Сумма пожертвований.
+    - **total_invested**: Распределенная сумма.
+    - **open_amount**: Нераспределенная сумма.
+    - **first_donation_date**, **last_donation_date**: Даты первого
+    и последнего пожертвования.
+    """
+    return await donation_crud.get_summary_by_user(
+        user=user, session=session
+    )
+
+
+@router.get(
+    '/summary',
+    response_model=list[DonationUserSummary],
+    dependencies=(Depends(current_superuser),)
+)
+async def get_donations_summary(
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Получить сводки по пожертвованиям всех пользователей.
+    Только для суперпользователей.
+
+    Сводки сгруппированы по user_id и содержат те же поля,
+    что и сводка текущего пользователя.
+    """
+    return await donation_crud.get_summaries(session)
+
+
+@router.get(
+    '/{donation_id}/investments',
+    response_model=list[InvestmentDB]
+)
+async def get_donation_investments(
+    donation_id: int,
     user: User = Depends(current_user),
     session: AsyncSession = Depends(get_async_session)
 ):
-    """Получить список пожертвований текущего пользователя."""
-    return await donation_crud.get_by_user(user=user, session=session)
+    """
+    Получить распределение пожертвования по проектам.
+
+    Пользователю доступны только собственные пожертвования.
+    """
+    await check_donation_exists(
+        donation_id=donation_id, user=user, session=session
+    )
+    return await investment_crud.get_by_donation(
+        donation_id=donation_id, session=session
+    )
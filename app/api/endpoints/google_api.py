@@ -1,8 +1,10 @@
+from typing import Optional
+
 from aiogoogle import Aiogoogle
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
+from app.core.db import get_read_session, read_only
 from app.core.google_client import get_service
 from app.core.user import current_superuser
 from app.crud import charity_project_crud
@@ -18,13 +20,25 @@ router = APIRouter()
     response_model=list[CharityProjectReadClosed],
     dependencies=(Depends(current_superuser),)
 )
+@read_only
 async def get_report(
-    session: AsyncSession = Depends(get_async_session),
+    limit: Optional[int] = Query(
+        None, ge=1, description='Количество самых быстрых проектов.'
+    ),
+    offset: int = Query(0, ge=0, description='Количество пропускаемых.'),
+    session: AsyncSession = Depends(get_read_session),
     wrapper_services: Aiogoogle = Depends(get_service)
 ):
-    """Создать гугл-таблицу с отчетом. Только для суперпользователей."""
+    """
+    Создать гугл-таблицу с отчетом. Только для суперпользователей.
+
+    Закрытые проекты упорядочиваются по времени сбора средств,
+    limit и offset позволяют получить только первые N проектов.
+    Эндпоинт только читает БД, поэтому проверка пользователя не занимает
+    соединение писателя на время запросов к Google API.
+    """
     projects = await charity_project_crud.get_projects_by_completion_rate(
-        session
+        session=session, limit=limit, offset=offset
     )
     spreadsheet_id = await spreadsheets_create(wrapper_services)
     await set_user_permissions(
@@ -0,0 +1,89 @@
+from http import HTTPStatus
+from typing import Awaitable, Callable, Optional
+
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud import table_version_crud
+
+
+class ListingCache:
+    """
+    Кеш сериализованных полных списков.
+
+    Тело ответа хранится вместе с версией таблицы, по которой оно
+    построено, и используется, пока счетчик изменений таблицы
+    не изменится.
+    """
+
+    def __init__(self) -> None:
+        self.bodies: dict[str, tuple[int, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: int) -> Optional[bytes]:
+        """Тело списка для версии таблицы, если оно закешировано."""
+        cached = self.bodies.get(key)
+        if cached is None or cached[0] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached[1]
+
+    def put(self, key: str, version: int, body: bytes) -> None:
+        """Сохранение тела списка для версии таблицы."""
+        self.bodies[key] = (version, body)
+
+    def clear(self) -> None:
+        """Очистка кеша."""
+        self.bodies.clear()
+
+
+listing_cache = ListingCache()
+
+
+def make_etag(version: int) -> str:
+    """ETag списка по версии таблицы."""
+    return f'"{version:x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с одним из значений заголовка If-None-Match."""
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag.removeprefix('W/') for tag in tags)
+
+
+async def cached_listing(
+    key: str,
+    table: str,
+    if_none_match: Optional[str],
+    render: Callable[[], Awaitable[bytes]],
+    session: AsyncSession
+) -> Response:
+    """
+    Полный список с ETag по версии таблицы table.
+
+    При совпадении If-None-Match возвращается 304 без тела, иначе
+    тело берется из кеша или строится функцией render. Версия читается
+    до построения тела, поэтому тело не может оказаться старше версии.
+    """
+    version = None
+    if settings.cache_listings:
+        version = await table_version_crud.get(name=table, session=session)
+    if version is None:
+        return Response(await render(), media_type='application/json')
+    etag = make_etag(version)
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag}
+        )
+    body = listing_cache.get(key=key, version=version)
+    if body is None:
+        body = await render()
+        listing_cache.put(key=key, version=version, body=body)
+    return Response(
+        body, media_type='application/json', headers={'ETag': etag}
+    )
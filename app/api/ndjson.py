@@ -0,0 +1,34 @@
+from typing import AsyncIterator, Optional
+
+from fastapi import Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Row
+
+from app.api.serialization import RowSerializer
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+async def accepts_ndjson(accept: Optional[str] = Header(None)) -> bool:
+    """Запрошена ли выдача списка в формате NDJSON."""
+    return accept is not None and NDJSON_MEDIA_TYPE in accept
+
+
+def ndjson_response(
+    rows: AsyncIterator[Row],
+    serializer: RowSerializer
+) -> StreamingResponse:
+    """
+    Потоковый ответ NDJSON.
+
+    Каждая строка сериализуется по мере чтения из БД,
+    поэтому расход памяти не зависит от размера списка.
+    """
+    async def lines() -> AsyncIterator[bytes]:
+        try:
+            async for row in rows:
+                yield serializer.dumps_item(row) + b'\n'
+        finally:
+            await rows.aclose()
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
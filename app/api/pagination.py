@@ -0,0 +1,93 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from fastapi.responses import Response
+
+from app.api.serialization import SchemaSerializer, dumps
+from app.core.config import settings
+
+INVALID_CURSOR = 'Некорректный курсор страницы.'
+
+
+class Pagination:
+    """Параметры постраничной выдачи по ключу (create_date, id)."""
+
+    def __init__(
+        self,
+        limit: int,
+        after: Optional[tuple[datetime, int]]
+    ) -> None:
+        self.limit = limit
+        self.after = after
+
+
+def encode_cursor(create_date: datetime, obj_id: int) -> str:
+    """Непрозрачный курсор для ключа (create_date, id)."""
+    return urlsafe_b64encode(
+        json.dumps([create_date.isoformat(), obj_id]).encode()
+    ).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Ключ (create_date, id) из курсора."""
+    try:
+        create_date, obj_id = json.loads(
+            urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        )
+        return datetime.fromisoformat(create_date), int(obj_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=INVALID_CURSOR
+        )
+
+
+async def get_pagination(
+    limit: Optional[int] = Query(
+        None, ge=1, le=settings.max_page_size,
+        description='Количество объектов на странице.'
+    ),
+    after: Optional[str] = Query(
+        None, description='Курсор из поля next_cursor предыдущей страницы.'
+    ),
+    full_list: bool = Query(
+        False, alias='all', description='Получить полный список без разбиения.'
+    )
+) -> Optional[Pagination]:
+    """
+    Параметры постраничной выдачи списка.
+
+    Возвращает None, если нужен полный список: запрошен параметр all
+    или не переданы limit и after при выключенной настройке
+    paginate_listings.
+    """
+    if full_list or (
+        limit is None and after is None and not settings.paginate_listings
+    ):
+        return None
+    return Pagination(
+        limit=limit or settings.page_size,
+        after=None if after is None else decode_cursor(after)
+    )
+
+
+def make_page(
+    items: list,
+    last_key: Optional[tuple[datetime, int]],
+    serializer: SchemaSerializer
+) -> Response:
+    """
+    Ответ со страницей списка и курсором следующей страницы.
+
+    Объекты страницы сериализуются serializer, поэтому его exclude_none
+    применяется только к их полям: поле next_cursor выдается всегда,
+    на последней странице со значением null.
+    """
+    return Response(dumps(dict(
+        items=[serializer.to_dict(item) for item in items],
+        next_cursor=None if last_key is None else encode_cursor(*last_key)
+    )), media_type='application/json')
@@ -1,9 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import (charity_project_router, donation_router,
-                               google_api_router, user_router)
+from app.api.endpoints import (allocation_router, charity_project_router,
+                               donation_router, google_api_router,
+                               user_router)
+from app.api.serialization import FastJSONResponse
 
-main_router = APIRouter()
+main_router = APIRouter(default_response_class=FastJSONResponse)
 main_router.include_router(user_router)
 main_router.include_router(
     charity_project_router, prefix='/charity_project', tags=['Charity Project']
@@ -14,3 +16,6 @@ main_router.include_router(
 main_router.include_router(
     google_api_router, prefix='/google', tags=['Google']
 )
+main_router.include_router(
+    allocation_router, prefix='/allocation', tags=['Allocation']
+)
@@ -0,0 +1,61 @@
+from typing import Any, Callable, Optional, Type, get_args, get_origin
+
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+from app.api.serialization import SchemaSerializer
+from app.core.config import settings
+from app.core.db import Base
+
+
+def get_trusted_schema(response_model: Any) -> Optional[Type[BaseModel]]:
+    """Схема ответа вида Schema или list[Schema]."""
+    if get_origin(response_model) is list:
+        response_model, = get_args(response_model)
+    if isinstance(response_model, type) and issubclass(
+        response_model, BaseModel
+    ):
+        return response_model
+    return None
+
+
+class TrustedORMRoute(APIRoute):
+    """
+    Маршрут, отдающий ORM-объекты без повторной валидации схемой ответа.
+
+    При выключенной настройке validate_responses ответ эндпоинта,
+    состоящий из ORM-объекта или списка ORM-объектов, сериализуется
+    по полям response_model через SchemaSerializer. Остальные ответы
+    проверяются схемой как обычно. Данные в БД уже прошли проверку
+    схемами при записи, поэтому результат совпадает с проверенным.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        schema = get_trusted_schema(self.response_model)
+        if schema is None:
+            return
+        serializer = SchemaSerializer(
+            schema=schema,
+            exclude=self.response_model_exclude or (),
+            exclude_none=self.response_model_exclude_none
+        )
+        call = self.dependant.call
+
+        async def trusted_call(**values) -> Any:
+            content = await call(**values)
+            if settings.validate_responses:
+                return content
+            if isinstance(content, Base):
+                return Response(
+                    serializer.dumps_item(content),
+                    media_type='application/json'
+                )
+            if isinstance(content, list) and all(
+                isinstance(item, Base) for item in content
+            ):
+                return serializer.response(content)
+            return content
+
+        self.dependant.call = trusted_call
@@ -1,20 +1,25 @@
+from contextlib import asynccontextmanager
 from http import HTTPStatus
+from typing import AsyncIterator, Optional
 
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud import charity_project_crud
-from app.models import CharityProject
+from app.crud import charity_project_crud, donation_crud
+from app.models import CharityProject, Donation, User
 
 
 class ErrorMessages:
     NAME_DUPLICATE = 'Проект с таким именем уже существует!'
     NOT_FOUND = 'Проект не найден'
+    DONATION_NOT_FOUND = 'Пожертвование не найдено'
     PROJECT_CLOSED = 'Закрытый проект нельзя редактировать!'
     PROJECT_INVESTED = 'В проект были внесены средства, не подлежит удалению!'
     INCORRECT_FULL_AMOUNT = (
         'Нельзя установить требуемую сумму меньше уже вложенной.'
     )
+    IMPORT_FORMAT = 'Поддерживаются только файлы .csv и .jsonl.'
 
 
 async def check_name_duplicate(
@@ -32,6 +37,28 @@ async def check_name_duplicate(
         )
 
 
+@asynccontextmanager
+async def check_name_unique(
+    project_name: Optional[str],
+    session: AsyncSession,
+) -> AsyncIterator[None]:
+    """
+    Перевод нарушения уникальности названия проекта в ответ 400.
+
+    Название проверяется ограничением уникальности при записи, отдельный
+    запрос выполняется только после ошибки IntegrityError, чтобы отличить
+    повтор названия от нарушения других ограничений.
+    """
+    try:
+        yield
+    except IntegrityError:
+        await session.rollback()
+        if project_name is None:
+            raise
+        await check_name_duplicate(project_name=project_name, session=session)
+        raise
+
+
 async def check_project_exists(
     project_id: int,
     session: AsyncSession,
@@ -46,6 +73,26 @@ async def check_project_exists(
     return project
 
 
+async def check_donation_exists(
+    donation_id: int,
+    user: User,
+    session: AsyncSession,
+) -> Donation:
+    """
+    Возвращает пожертвование с переданным id, если оно есть в базе данных
+    и принадлежит пользователю (суперпользователю доступны все).
+    """
+    donation = await donation_crud.get(donation_id, session)
+    if donation is None or (
+        donation.user_id != user.id and not user.is_superuser
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail=ErrorMessages.DONATION_NOT_FOUND
+        )
+    return donation
+
+
 async def check_full_amount_ge_invested_amount(
     full_amount: int,
     invested_amount: int
@@ -67,6 +114,32 @@ async def check_project_is_opened(project: CharityProject) -> None:
         )
 
 
+async def check_project_is_updatable(
+    project_id: int,
+    project_name: Optional[str],
+    full_amount: Optional[int],
+    session: AsyncSession,
+) -> CharityProject:
+    """
+    Проверки проекта, который не удалось изменить условным UPDATE.
+
+    Возвращает проект, если все проверки пройдены (проект был изменен
+    параллельной транзакцией между запросами).
+    """
+    project = await check_project_exists(
+        project_id=project_id, session=session
+    )
+    await check_project_is_opened(project)
+    if project_name is not None and project_name != project.name:
+        await check_name_duplicate(project_name=project_name, session=session)
+    if full_amount is not None:
+        await check_full_amount_ge_invested_amount(
+            full_amount=full_amount,
+            invested_amount=project.invested_amount
+        )
+    return project
+
+
 async def check_project_is_not_invested(project: CharityProject) -> None:
     """Проверка на то, что в проект не были инвестированы средства."""
     if project.invested_amount > 0:
@@ -74,3 +147,16 @@ async def check_project_is_not_invested(project: CharityProject) -> None:
             status_code=HTTPStatus.BAD_REQUEST,
             detail=ErrorMessages.PROJECT_INVESTED
         )
+
+
+async def check_import_format(filename: Optional[str]) -> str:
+    """Возвращает формат файла импорта по расширению имени файла."""
+    import_format = (filename or '').rsplit('.', 1)[-1].lower()
+    if import_format == 'ndjson':
+        import_format = 'jsonl'
+    if import_format not in ('csv', 'jsonl'):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=ErrorMessages.IMPORT_FORMAT
+        )
+    return import_format
@@ -1,3 +1,4 @@
 """Импорты класса Base и всех моделей для Alembic."""
 from app.core.db import Base # noqa
-from app.models import CharityProject, Donation, User # noqa
+from app.models import (CharityProject, Donation, Investment, # noqa
+                        TableVersion, User)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, BaseSettings, EmailStr
 
@@ -24,6 +24,49 @@ class Settings(BaseSettings):
     client_x509_cert_url: Optional[str] = None
     email: Optional[str] = None
     locale: str = 'ru_RU'
+    investment_engine: Literal['python', 'sql'] = 'python'
+    opened_chunk_size: int = 100
+    investment_locking: bool = False
+    investment_retries: int = 3
+    allocation_queue: bool = False
+    allocation_window: float = 0.05
+    allocation_batch_size: int = 500
+    allocation_retry_delay: float = 1
+    allocation_retry_max_delay: float = 60
+    max_donation_batch_size: int = 100
+    open_pool_index: bool = False
+    import_chunk_size: int = 1000
+    paginate_listings: bool = False
+    page_size: int = 100
+    max_page_size: int = 1000
+    stream_chunk_size: int = 500
+    cache_listings: bool = True
+    validate_responses: bool = True
+    pool_class: Optional[Literal['queue', 'null', 'static']] = None
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    query_cache_size: int = 500
+    sql_echo: bool = False
+    sqlite_journal_mode: Literal[
+        'WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF'
+    ] = 'WAL'
+    sqlite_synchronous: Literal['OFF', 'NORMAL', 'FULL', 'EXTRA'] = 'NORMAL'
+    sqlite_busy_timeout: int = 5000
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size: int = -65536
+    sqlite_temp_store: Literal['DEFAULT', 'FILE', 'MEMORY'] = 'MEMORY'
+    sqlite_writer: bool = True
+    pg_statement_cache_size: int = 100
+    pg_jit: bool = False
+    replica_url: Optional[str] = None
+    replica_max_lag: float = 5
+    replica_check_interval: float = 1
+    cache_users: bool = True
+    user_cache_size: int = 1024
+    user_cache_ttl: float = 60
 
     class Config:
         env_file = '.env'
@@ -1,4 +1,5 @@
 from datetime import timedelta
+from enum import Enum
 from typing import TypedDict
 
 ProjectClosedDict = TypedDict(
@@ -7,3 +8,9 @@ ProjectClosedDict = TypedDict(
      'gathering_time': timedelta,
      'description': str}
 )
+
+
+class AllocationState(str, Enum):
+    """Состояние распределения средств проекта/пожертвования."""
+    PENDING = 'pending'
+    ALLOCATED = 'allocated'
@@ -1,11 +1,20 @@
-from typing import AsyncIterator
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Optional, Union
 
-from sqlalchemy import Column, Integer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from fastapi import Request
+from sqlalchemy import Column, Integer, event, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    create_async_engine)
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, StaticPool
 
 from app.core.config import settings
 
+logger = logging.getLogger('main_logger')
+
 
 class PreBase:
 
@@ -18,12 +27,285 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
-engine = create_async_engine(settings.database_url)
+POOL_CLASSES = {
+    'queue': AsyncAdaptedQueuePool,
+    'null': NullPool,
+    'static': StaticPool,
+}
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+REPLICA_LAG_QUERIES = {
+    'postgresql': text(
+        'SELECT CASE WHEN NOT pg_is_in_recovery() OR '
+        'pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+        'END'
+    ),
+}
+# Для СУБД без встроенной репликации проверяется только доступность.
+DEFAULT_REPLICA_LAG_QUERY = text('SELECT 0')
+
+
+def is_sqlite_file(url: URL) -> bool:
+    """Адрес указывает на файловую БД SQLite."""
+    return (
+        url.get_backend_name() == 'sqlite' and
+        url.database not in (None, '', ':memory:')
+    )
+
+
+def get_pool_class(url: URL) -> str:
+    """
+    Тип пула соединений по умолчанию для диалекта.
+
+    SQLite в памяти использует одно общее соединение (StaticPool).
+    Файловая SQLite в режиме WAL, где читатели не блокируются писателем,
+    использует пул, в остальных режимах открывает соединение на каждую
+    сессию (NullPool). Остальные СУБД используют пул фиксированного
+    размера.
+    """
+    if url.get_backend_name() != 'sqlite':
+        return 'queue'
+    if not is_sqlite_file(url):
+        return 'static'
+    if settings.sqlite_journal_mode == 'WAL':
+        return 'queue'
+    return 'null'
+
+
+def get_asyncpg_connect_args() -> dict[str, Any]:
+    """
+    Параметры соединения asyncpg.
+
+    Подготовленные выражения кешируются в каждом соединении пула
+    (0 отключает кеш, что нужно при работе через pgbouncer в режиме
+    транзакций). JIT-компиляция по умолчанию выключена: короткие
+    запросы приложения она только замедляет.
+    """
+    return dict(
+        prepared_statement_cache_size=settings.pg_statement_cache_size,
+        server_settings=dict(
+            jit='on' if settings.pg_jit else 'off',
+            application_name=settings.app_title,
+        ),
+    )
+
+
+def get_engine_options(url: Union[str, URL]) -> dict[str, Any]:
+    """Параметры create_async_engine по настройкам приложения."""
+    url = make_url(url)
+    pool_class = settings.pool_class or get_pool_class(url)
+    options = dict(
+        poolclass=POOL_CLASSES[pool_class],
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_recycle=settings.pool_recycle,
+        query_cache_size=settings.query_cache_size,
+        echo=settings.sql_echo,
+    )
+    if pool_class == 'queue':
+        options.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.pool_max_overflow,
+            pool_timeout=settings.pool_timeout,
+        )
+    if url.get_driver_name() == 'asyncpg':
+        options.update(connect_args=get_asyncpg_connect_args())
+    return options
+
+
+def get_sqlite_pragmas() -> dict[str, Union[int, str]]:
+    """PRAGMA, выполняемые на каждом новом соединении с файловой SQLite."""
+    return dict(
+        journal_mode=settings.sqlite_journal_mode,
+        synchronous=settings.sqlite_synchronous,
+        busy_timeout=settings.sqlite_busy_timeout,
+        mmap_size=settings.sqlite_mmap_size,
+        cache_size=settings.sqlite_cache_size,
+        temp_store=settings.sqlite_temp_store,
+    )
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Применение профиля SQLite к новому соединению."""
+    cursor = dbapi_connection.cursor()
+    for name, value in get_sqlite_pragmas().items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def create_engine(url: Union[str, URL], writer: bool = False) -> AsyncEngine:
+    """
+    Движок приложения.
+
+    Движок писателя держит единственное соединение, поэтому пишущие
+    транзакции выполняются по очереди, не получая ошибку блокировки БД.
+    К соединениям с файловой SQLite применяется профиль PRAGMA.
+    """
+    url = make_url(url)
+    options = get_engine_options(url)
+    if writer:
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=settings.pool_timeout,
+        )
+    engine = create_async_engine(url, **options)
+    if is_sqlite_file(url):
+        event.listen(engine.sync_engine, 'connect', set_sqlite_pragmas)
+    return engine
+
+
+def uses_writer(url: Union[str, URL]) -> bool:
+    """Пишущие транзакции направляются в отдельное соединение писателя."""
+    return settings.sqlite_writer and is_sqlite_file(make_url(url))
+
 
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
+engine = create_engine(settings.database_url)
+writer_engine = (
+    create_engine(settings.database_url, writer=True)
+    if uses_writer(settings.database_url) else engine
+)
 
+AsyncSessionLocal = sessionmaker(
+    writer_engine, class_=AsyncSession, expire_on_commit=False
+)
+ReadSessionLocal = sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False
+)
 
-async def get_async_session() -> AsyncIterator[AsyncSession]:
-    """Асинхронный генератор сессий."""
-    async with AsyncSessionLocal() as session:
+
+class ReplicaRouter:
+    """
+    Выбор БД для тяжелых запросов на чтение.
+
+    Доступность и отставание реплики проверяются не чаще раза
+    в settings.replica_check_interval секунд. Пока реплика недоступна
+    или отстает больше чем на settings.replica_max_lag секунд, чтение
+    идет из пула читателей основной БД. Ошибка БД во время чтения
+    с реплики переключает чтение на основную БД до следующей проверки.
+    """
+
+    def __init__(self, engine: Optional[AsyncEngine] = None) -> None:
+        self.engine = engine
+        self.session_factory = None
+        if engine is not None:
+            self.session_factory = sessionmaker(
+                engine, class_=AsyncSession, expire_on_commit=False
+            )
+        self.healthy = False
+        self.checked_at: Optional[float] = None
+        self.lag: Optional[float] = None
+        self.reads = 0
+        self.fallbacks = 0
+
+    async def check(self) -> bool:
+        """Проверка доступности и отставания реплики."""
+        self.checked_at = time.monotonic()
+        query = REPLICA_LAG_QUERIES.get(
+            self.engine.dialect.name, DEFAULT_REPLICA_LAG_QUERY
+        )
+        try:
+            async with self.engine.connect() as conn:
+                self.lag = float((await conn.execute(query)).scalar() or 0)
+        except (DBAPIError, OSError) as error:
+            logger.warning('Реплика БД недоступна: %s', error)
+            self.lag = None
+            self.healthy = False
+        else:
+            self.healthy = self.lag <= settings.replica_max_lag
+        return self.healthy
+
+    async def is_available(self) -> bool:
+        """Можно ли читать с реплики."""
+        if self.engine is None:
+            return False
+        if (
+            self.checked_at is None or
+            time.monotonic() - self.checked_at >=
+            settings.replica_check_interval
+        ):
+            return await self.check()
+        return self.healthy
+
+    def mark_failed(self) -> None:
+        """Переключение чтения на основную БД до следующей проверки."""
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+    async def get_session_factory(self) -> sessionmaker:
+        """Фабрика сессий реплики или пула читателей основной БД."""
+        if await self.is_available():
+            self.reads += 1
+            return self.session_factory
+        if self.engine is not None:
+            self.fallbacks += 1
+        return ReadSessionLocal
+
+
+replica_router = ReplicaRouter(
+    create_engine(settings.replica_url) if settings.replica_url else None
+)
+
+
+async def dispose_engines() -> None:
+    """Закрытие соединений движков читателей, писателя и реплики."""
+    await engine.dispose()
+    if writer_engine is not engine:
+        await writer_engine.dispose()
+    if replica_router.engine is not None:
+        await replica_router.engine.dispose()
+
+
+def read_only(endpoint: Callable) -> Callable:
+    """
+    Пометка эндпоинта, который только читает БД.
+
+    Такой эндпоинт получает сессию пула читателей при любом HTTP-методе
+    и не занимает единственное соединение писателя, например, пока
+    ожидает ответов внешних сервисов.
+    """
+    endpoint.read_only = True
+    return endpoint
+
+
+def is_read_request(request: Request) -> bool:
+    """Запрос на чтение или к эндпоинту, помеченному read_only."""
+    return request.method in READ_METHODS or getattr(
+        request.scope.get('endpoint'), 'read_only', False
+    )
+
+
+async def get_async_session(
+    request: Request = None
+) -> AsyncIterator[AsyncSession]:
+    """
+    Асинхронный генератор сессий.
+
+    Запросы на чтение и запросы к эндпоинтам, помеченным read_only,
+    получают сессию из пула читателей, остальные запросы и вызовы вне
+    HTTP-запроса — сессию писателя.
+    """
+    session_factory = AsyncSessionLocal
+    if request is not None and is_read_request(request):
+        session_factory = ReadSessionLocal
+    async with session_factory() as session:
         yield session
+
+
+async def get_read_session() -> AsyncIterator[AsyncSession]:
+    """
+    Асинхронный генератор сессий для тяжелых запросов на чтение.
+
+    Сессия открывается на реплике, если она настроена и доступна,
+    иначе — в пуле читателей основной БД.
+    """
+    session_factory = await replica_router.get_session_factory()
+    async with session_factory() as session:
+        try:
+            yield session
+        except (DBAPIError, OSError):
+            if session_factory is replica_router.session_factory:
+                replica_router.mark_failed()
+            raise
@@ -1,13 +1,16 @@
 import logging
-from typing import Optional, Union
+from typing import Any, Optional, Union
 
+from cachetools import TTLCache
 from fastapi import Depends, Request
 from fastapi_users import (BaseUserManager, FastAPIUsers, IntegerIDMixin,
                            InvalidPasswordException)
 from fastapi_users.authentication import (AuthenticationBackend,
                                           BearerTransport, JWTStrategy)
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from app.core.config import settings
 from app.core.constants import PASSWORD_MIN_LENGTH
@@ -37,8 +40,86 @@ auth_backend = AuthenticationBackend(
 )
 
 
+class UserCache:
+    """
+    Кеш активных пользователей по id.
+
+    Хранит значения колонок не более settings.user_cache_size
+    пользователей не дольше settings.user_cache_ttl секунд, при
+    переполнении вытесняются давно не запрошенные. Каждое обращение
+    возвращает новый отсоединенный объект, UserManager присоединяет его
+    к сессии текущего запроса. Изменения пользователя через UserManager
+    удаляют его из кеша, изменения в других процессах становятся видны
+    по истечении времени жизни записи.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.columns = [attr.key for attr in inspect(User).column_attrs]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        """Пользователь из кеша или None."""
+        values = self.users.get(user_id)
+        if values is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User) -> None:
+        """Сохранение активного пользователя в кеш."""
+        if user.is_active:
+            self.users[user.id] = {
+                column: getattr(user, column) for column in self.columns
+            }
+
+    def invalidate(self, user_id: Any) -> None:
+        """Удаление пользователя из кеша."""
+        self.users.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Очистка кеша и счетчиков."""
+        self.users.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+user_cache = UserCache(
+    maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl
+)
+
+
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
 
+    async def get(self, id: int) -> User:
+        """
+        Пользователь по id с использованием кеша активных пользователей.
+
+        Пользователь из кеша присоединяется к сессии запроса. Если
+        пользователь уже загружен в сессию, возвращается загруженный
+        объект, иначе его нельзя было бы изменить в этой сессии.
+        """
+        if not settings.cache_users:
+            return await super().get(id)
+        user = user_cache.get(id)
+        if user is None:
+            user = await super().get(id)
+            user_cache.put(user)
+            return user
+        session = self.user_db.session
+        loaded = session.identity_map.get(session.identity_key(User, id))
+        if loaded is not None:
+            return loaded
+        return await session.merge(user, load=False)
+
+    async def delete(self, user: User) -> None:
+        user_cache.invalidate(user.id)
+        await super().delete(user)
+
     async def validate_password(
         self,
         password: str,
@@ -61,6 +142,24 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     ):
         logger.info(f'Пользователь {user.email} зарегистрирован.')
 
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: dict[str, Any],
+        request: Optional[Request] = None
+    ):
+        user_cache.invalidate(user.id)
+
+    async def on_after_verify(
+        self, user: User, request: Optional[Request] = None
+    ):
+        user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        user_cache.invalidate(user.id)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
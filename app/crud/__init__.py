@@ -1,2 +1,4 @@
 from app.crud.charity_project import charity_project_crud # noqa
 from app.crud.donation import donation_crud # noqa
+from app.crud.investment import investment_crud # noqa
+from app.crud.table_version import table_version_crud # noqa
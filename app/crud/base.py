@@ -1,10 +1,17 @@
-from typing import Generic, Optional, Type, TypeVar
+from datetime import datetime
+from typing import AsyncIterator, Generic, Optional, Type, TypeVar
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import (Column, and_, bindparam, func, insert, select,
+                        tuple_, update)
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import Select
 
+from app.core.config import settings
 from app.core.db import Base
 from app.models import User
 
@@ -12,6 +19,21 @@ ModelType = TypeVar('ModelType', bound=Base)
 CreateSchemaType = TypeVar('CreateSchemaType', bound=BaseModel)
 UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseModel)
 
+INVESTED_FIELDS = ('invested_amount', 'fully_invested', 'close_date')
+
+
+def get_shares(rows: list[Row], amount: int) -> list[tuple[int, int]]:
+    """
+    Суммы, полученные объектами при распределении суммы amount.
+
+    В rows передаются строки с полями id, remaining и running
+    в порядке нарастающего итога.
+    """
+    return [
+        (row.id, min(row.remaining, amount - row.running + row.remaining))
+        for row in rows
+    ]
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """Базовый класс для CRUD-операций."""
@@ -22,6 +44,19 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     ) -> None:
         self.model = model
 
+    def opened_condition(self):
+        """
+        Условие отбора открытых объектов, доступных для распределения.
+
+        Объекты, ожидающие обработки в очереди распределения,
+        не участвуют в распределении как получатели. Условие совпадает
+        с условием частичного индекса opened_index.
+        """
+        return and_(
+            self.model.fully_invested.is_(False),
+            self.model.allocation_pending.is_(False)
+        )
+
     async def get(
         self,
         obj_id: int,
@@ -43,6 +78,91 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_objs = await session.execute(select(self.model))
         return db_objs.scalars().all()
 
+    async def get_page(
+        self,
+        limit: int,
+        after: Optional[tuple[datetime, int]],
+        session: AsyncSession,
+        *where
+    ) -> tuple[list[ModelType], Optional[tuple[datetime, int]]]:
+        """
+        Получение страницы объектов в порядке create_date, id.
+
+        Страница начинается после ключа after. Возвращает объекты
+        и ключ последнего из них, если за ним есть еще объекты.
+        """
+        query = select(self.model).where(*where)
+        if after is not None:
+            query = query.where(
+                tuple_(self.model.create_date, self.model.id) > after
+            )
+        db_objs = await session.execute(
+            query.order_by(
+                self.model.create_date, self.model.id
+            ).limit(limit + 1)
+        )
+        db_objs = db_objs.scalars().all()
+        if len(db_objs) <= limit:
+            return db_objs, None
+        db_objs = db_objs[:limit]
+        return db_objs, (db_objs[-1].create_date, db_objs[-1].id)
+
+    def select_rows(self, columns: list[Column], *where) -> Select:
+        """Запрос столбцов columns в порядке create_date, id."""
+        return select(*columns).where(*where).order_by(
+            self.model.create_date, self.model.id
+        )
+
+    async def get_rows(
+        self,
+        columns: list[Column],
+        session: AsyncSession,
+        *where
+    ) -> list[Row]:
+        """
+        Получение строк со столбцами columns в порядке create_date, id.
+
+        Строки читаются без создания ORM-объектов и не попадают
+        в identity map сессии.
+        """
+        rows = await session.execute(self.select_rows(columns, *where))
+        return rows.all()
+
+    async def stream_rows(
+        self,
+        columns: list[Column],
+        session: AsyncSession,
+        *where
+    ) -> AsyncIterator[Row]:
+        """
+        Потоковое получение строк со столбцами columns.
+
+        Строки читаются через серверный курсор порциями
+        по settings.stream_chunk_size.
+        """
+        rows = await session.stream(self.select_rows(columns, *where))
+        try:
+            async for partition in rows.partitions(
+                settings.stream_chunk_size
+            ):
+                for row in partition:
+                    yield row
+        finally:
+            await rows.close()
+
+    async def get_multi_by_ids(
+        self,
+        obj_ids: list[int],
+        session: AsyncSession
+    ) -> list[ModelType]:
+        """Получение объектов по списку id одним запросом."""
+        db_objs = await session.execute(
+            select(self.model).where(
+                self.model.id.in_(obj_ids)
+            ).order_by(self.model.id)
+        )
+        return db_objs.scalars().all()
+
     async def create(
         self,
         obj_in: CreateSchemaType,
@@ -58,9 +178,25 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         session.add(db_obj)
         if commit:
             await session.commit()
-            await session.refresh(db_obj)
         return db_obj
 
+    async def create_multi(
+        self,
+        rows: list[dict],
+        session: AsyncSession
+    ) -> None:
+        """Добавление объектов одним пакетным INSERT без загрузки в сессию."""
+        if rows:
+            await session.execute(insert(self.model), rows)
+
+    async def get_max_id(
+        self,
+        session: AsyncSession
+    ) -> int:
+        """Получение наибольшего id объектов."""
+        max_id = await session.execute(select(func.max(self.model.id)))
+        return max_id.scalar() or 0
+
     async def update(
         self,
         db_obj: ModelType,
@@ -76,7 +212,6 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 setattr(db_obj, field, update_data[field])
         session.add(db_obj)
         await session.commit()
-        await session.refresh(db_obj)
         return db_obj
 
     async def remove(
@@ -96,7 +231,304 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """Получение всех открытых проектов/пожертвований."""
         db_objs = await session.execute(
             select(self.model).where(
-                self.model.fully_invested.is_(False)
+                self.opened_condition()
+            ).order_by(self.model.create_date, self.model.id)
+        )
+        return db_objs.scalars().all()
+
+    async def has_opened(
+        self,
+        session: AsyncSession
+    ) -> bool:
+        """Проверка наличия открытых проектов/пожертвований."""
+        db_obj_id = await session.execute(
+            select(self.model.id).where(
+                self.opened_condition()
+            ).limit(1)
+        )
+        return db_obj_id.scalars().first() is not None
+
+    async def get_opened_remaining(
+        self,
+        session: AsyncSession
+    ) -> list[tuple[int, datetime, int]]:
+        """Получение id, даты создания и остатка открытых объектов."""
+        db_rows = await session.execute(
+            select(
+                self.model.id,
+                self.model.create_date,
+                self.model.full_amount - self.model.invested_amount
+            ).where(
+                self.opened_condition()
+            ).order_by(self.model.create_date, self.model.id)
+        )
+        return db_rows.all()
+
+    async def get_opened_totals(
+        self,
+        session: AsyncSession
+    ) -> tuple[int, int]:
+        """Получение количества и суммарного остатка открытых объектов."""
+        db_totals = await session.execute(
+            select(
+                func.count(self.model.id),
+                func.coalesce(
+                    func.sum(
+                        self.model.full_amount - self.model.invested_amount
+                    ), 0
+                )
+            ).where(
+                self.opened_condition()
             )
         )
+        return tuple(db_totals.one())
+
+    async def get_opened_after(
+        self,
+        obj_id: int,
+        session: AsyncSession
+    ) -> list[ModelType]:
+        """Получение открытых объектов с id больше obj_id."""
+        db_objs = await session.execute(
+            select(self.model).where(
+                self.opened_condition(),
+                self.model.id > obj_id
+            ).order_by(self.model.create_date, self.model.id)
+        )
         return db_objs.scalars().all()
+
+    async def get_pending(
+        self,
+        session: AsyncSession
+    ) -> list[ModelType]:
+        """Получение объектов, ожидающих распределения средств."""
+        db_objs = await session.execute(
+            select(self.model).where(
+                self.model.allocation_pending.is_(True)
+            ).order_by(self.model.create_date, self.model.id)
+        )
+        return db_objs.scalars().all()
+
+    async def stream_opened(
+        self,
+        session: AsyncSession
+    ) -> AsyncIterator[ModelType]:
+        """
+        Потоковое получение открытых проектов/пожертвований.
+
+        Объекты выдаются в порядке create_date, id и подгружаются
+        из курсора порциями по settings.opened_chunk_size.
+        В режиме investment_locking строки блокируются через
+        FOR UPDATE SKIP LOCKED (SQLite блокировки строк не поддерживает).
+        """
+        opened = select(self.model).where(
+            self.opened_condition()
+        ).order_by(
+            self.model.create_date, self.model.id
+        ).execution_options(yield_per=settings.opened_chunk_size)
+        if settings.investment_locking:
+            opened = opened.with_for_update(skip_locked=True)
+        db_objs = await session.stream_scalars(opened)
+        try:
+            async for db_obj in db_objs:
+                yield db_obj
+        finally:
+            await db_objs.close()
+
+    async def distribute_to_opened(
+        self,
+        amount: int,
+        session: AsyncSession
+    ) -> list[tuple[int, int]]:
+        """
+        Распределение суммы по открытым проектам/пожертвованиям в БД.
+
+        Очередность определяется нарастающим итогом остатков в порядке
+        create_date, id. Полностью покрытые объекты закрываются одним
+        UPDATE, частично покрытый объект обновляется вторым.
+        Возвращает пары (id, сумма) получивших средства объектов
+        в порядке распределения.
+        """
+        if settings.investment_locking:
+            return await self.distribute_to_locked(
+                amount=amount, session=session
+            )
+        remaining = self.model.full_amount - self.model.invested_amount
+        opened = select(
+            self.model.id,
+            remaining.label('remaining'),
+            func.sum(remaining).over(
+                order_by=(self.model.create_date, self.model.id)
+            ).label('running')
+        ).where(
+            self.opened_condition()
+        ).subquery()
+        reached = opened.c.running - opened.c.remaining < amount
+        shares = await session.execute(
+            select(opened).where(reached).order_by(opened.c.running)
+        )
+        shares = shares.all()
+        if not shares:
+            return []
+        last = shares[-1]
+        await session.execute(
+            update(self.model).where(
+                self.model.id.in_(
+                    select(opened.c.id).where(
+                        reached, opened.c.running <= amount
+                    )
+                )
+            ).values(
+                invested_amount=self.model.full_amount,
+                fully_invested=True,
+                close_date=datetime.now(),
+                version=self.model.version + 1
+            ).execution_options(synchronize_session=False)
+        )
+        if last.running > amount:
+            await session.execute(
+                update(self.model).where(
+                    self.model.id == last.id
+                ).values(
+                    invested_amount=(
+                        self.model.invested_amount +
+                        amount - (last.running - last.remaining)
+                    ),
+                    version=self.model.version + 1
+                ).execution_options(synchronize_session=False)
+            )
+        return get_shares(rows=shares, amount=amount)
+
+    async def distribute_to_locked(
+        self,
+        amount: int,
+        session: AsyncSession
+    ) -> list[tuple[int, int]]:
+        """
+        Распределение суммы по открытым объектам с блокировкой строк.
+
+        Открытые строки блокируются через FOR UPDATE SKIP LOCKED,
+        затронутые строки обновляются по (id, version). Если версия
+        строки изменилась параллельной транзакцией, вызывается
+        StaleDataError. Возвращает пары (id, сумма) как
+        distribute_to_opened.
+        """
+        locked = select(
+            self.model.id,
+            self.model.version,
+            self.model.full_amount,
+            self.model.invested_amount,
+            self.model.create_date
+        ).where(
+            self.opened_condition()
+        ).with_for_update(skip_locked=True).cte('locked')
+        remaining = locked.c.full_amount - locked.c.invested_amount
+        opened = select(
+            locked.c.id,
+            locked.c.version,
+            remaining.label('remaining'),
+            func.sum(remaining).over(
+                order_by=(locked.c.create_date, locked.c.id)
+            ).label('running')
+        ).subquery()
+        reached = await session.execute(
+            select(opened).where(
+                opened.c.running - opened.c.remaining < amount
+            ).order_by(opened.c.running)
+        )
+        reached = reached.all()
+        if not reached:
+            return []
+        last = reached[-1]
+        covered = [
+            (row.id, row.version) for row in reached if row.running <= amount
+        ]
+        if covered:
+            await self.update_versioned(
+                versions=covered,
+                values=dict(
+                    invested_amount=self.model.full_amount,
+                    fully_invested=True,
+                    close_date=datetime.now()
+                ),
+                session=session
+            )
+        if last.running > amount:
+            await self.update_versioned(
+                versions=[(last.id, last.version)],
+                values=dict(
+                    invested_amount=(
+                        self.model.invested_amount +
+                        amount - (last.running - last.remaining)
+                    )
+                ),
+                session=session
+            )
+        return get_shares(rows=reached, amount=amount)
+
+    async def save_invested(
+        self,
+        db_objs: list[ModelType],
+        session: AsyncSession
+    ) -> None:
+        """
+        Запись вложенных сумм измененных объектов одним пакетным UPDATE.
+
+        Строки обновляются по (id, version), как при flush ORM, но одним
+        executemany вместо отдельного UPDATE на каждый объект. Записанные
+        значения помечаются в сессии как сохраненные.
+        """
+        if not db_objs:
+            return
+        table = self.model.__table__
+        result = await session.execute(
+            update(table).where(
+                table.c.id == bindparam('obj_id'),
+                table.c.version == bindparam('obj_version')
+            ).values(version=table.c.version + 1),
+            [
+                dict(
+                    obj_id=db_obj.id,
+                    obj_version=db_obj.version,
+                    invested_amount=db_obj.invested_amount,
+                    fully_invested=db_obj.fully_invested,
+                    close_date=db_obj.close_date
+                ) for db_obj in db_objs
+            ]
+        )
+        if (
+            result.rowcount != len(db_objs) and
+            session.bind.dialect.supports_sane_multi_rowcount
+        ):
+            raise StaleDataError(
+                'Открытые объекты изменены параллельной транзакцией.'
+            )
+        for db_obj in db_objs:
+            for field in INVESTED_FIELDS:
+                set_committed_value(db_obj, field, getattr(db_obj, field))
+            set_committed_value(db_obj, 'version', db_obj.version + 1)
+
+    async def update_versioned(
+        self,
+        versions: list[tuple[int, int]],
+        values: dict,
+        session: AsyncSession
+    ) -> None:
+        """
+        Массовое обновление строк с проверкой версии.
+
+        В versions передаются пары (id, version), прочитанные ранее.
+        Если хотя бы одна строка изменена параллельной транзакцией,
+        вызывается StaleDataError.
+        """
+        result = await session.execute(
+            update(self.model).where(
+                tuple_(self.model.id, self.model.version).in_(versions)
+            ).values(
+                version=self.model.version + 1, **values
+            ).execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(versions):
+            raise StaleDataError(
+                'Открытые объекты изменены параллельной транзакцией.'
+            )
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.custom_types import ProjectClosedDict
@@ -28,25 +28,91 @@ class CRUDCharityProject(
         )
         return db_project_id.scalars().first()
 
+    async def get_existing_names(
+        self,
+        names: list[str],
+        session: AsyncSession,
+    ) -> set[str]:
+        """Получение названий из списка, уже занятых проектами."""
+        db_names = await session.execute(
+            select(CharityProject.name).where(
+                CharityProject.name.in_(names)
+            )
+        )
+        return set(db_names.scalars().all())
+
+    async def update_opened(
+        self,
+        project_id: int,
+        obj_in: CharityProjectUpdate,
+        session: AsyncSession
+    ) -> Optional[CharityProject]:
+        """
+        Изменение открытого проекта одним условным UPDATE.
+
+        Строка изменяется, только если проект существует, открыт и новая
+        требуемая сумма не меньше вложенной. Если диалект поддерживает
+        RETURNING, измененный проект возвращается тем же запросом, иначе
+        загружается отдельным SELECT. Возвращает None, если условие
+        не выполнено.
+        """
+        values = obj_in.dict(exclude_unset=True)
+        table = CharityProject.__table__
+        conditions = [
+            table.c.id == project_id,
+            table.c.fully_invested.is_(False)
+        ]
+        if 'full_amount' in values:
+            conditions.append(table.c.invested_amount <= values['full_amount'])
+        statement = update(table).where(*conditions).values(
+            version=table.c.version + 1, **values
+        )
+        if session.bind.dialect.full_returning:
+            project = await session.execute(
+                select(CharityProject).from_statement(
+                    statement.returning(*table.c)
+                ).execution_options(populate_existing=True)
+            )
+            return project.scalars().first()
+        result = await session.execute(statement)
+        if not result.rowcount:
+            return None
+        return await session.get(
+            CharityProject, project_id, populate_existing=True
+        )
+
     async def get_projects_by_completion_rate(
             self,
-            session: AsyncSession
+            session: AsyncSession,
+            limit: Optional[int] = None,
+            offset: int = 0
     ) -> list[ProjectClosedDict]:
-        """Получение списка с данными о закрытых проектах."""
+        """
+        Получение списка с данными о закрытых проектах.
+
+        Проекты упорядочиваются по времени сбора средств в БД
+        по индексу ix_charityproject_gathering_time, limit и offset
+        ограничивают выборку первыми проектами.
+        """
         projects = await session.execute(
-            select(CharityProject).where(CharityProject.fully_invested)
-        )
-        projects = projects.scalars().all()
-        return sorted(
-            [
-                {
-                    'name': project.name,
-                    'gathering_time': project.close_date - project.create_date,
-                    'description': project.description
-                } for project in projects
-            ],
-            key=lambda elem: elem['gathering_time']
+            select(
+                CharityProject.name,
+                CharityProject.description,
+                CharityProject.create_date,
+                CharityProject.close_date
+            ).where(
+                CharityProject.closed_condition()
+            ).order_by(
+                CharityProject.gathering_seconds(), CharityProject.id
+            ).limit(limit).offset(offset)
         )
+        return [
+            {
+                'name': project.name,
+                'gathering_time': project.close_date - project.create_date,
+                'description': project.description
+            } for project in projects
+        ]
 
 
 charity_project_crud = CRUDCharityProject(CharityProject)
@@ -1,5 +1,9 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import Column, func, select
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.base import CRUDBase
@@ -21,9 +25,82 @@ class CRUDDonation(
         donations = await session.execute(
             select(Donation).where(
                 Donation.user_id == user.id
-            )
+            ).order_by(Donation.create_date)
         )
         return donations.scalars().all()
 
+    def summary_columns(self) -> list:
+        """Агрегаты сводки по пожертвованиям."""
+        return [
+            func.count(Donation.id).label('count'),
+            func.coalesce(func.sum(Donation.full_amount), 0).label(
+                'total_donated'
+            ),
+            func.coalesce(func.sum(Donation.invested_amount), 0).label(
+                'total_invested'
+            ),
+            func.coalesce(
+                func.sum(Donation.full_amount - Donation.invested_amount), 0
+            ).label('open_amount'),
+            func.min(Donation.create_date).label('first_donation_date'),
+            func.max(Donation.create_date).label('last_donation_date'),
+        ]
+
+    async def get_summary_by_user(
+        self,
+        user: User,
+        session: AsyncSession
+    ) -> Row:
+        """Сводка по пожертвованиям пользователя одним запросом."""
+        summary = await session.execute(
+            select(*self.summary_columns()).where(
+                Donation.user_id == user.id
+            )
+        )
+        return summary.one()
+
+    async def get_summaries(self, session: AsyncSession) -> list[Row]:
+        """Сводки по пожертвованиям всех пользователей."""
+        summaries = await session.execute(
+            select(Donation.user_id, *self.summary_columns()).group_by(
+                Donation.user_id
+            ).order_by(Donation.user_id)
+        )
+        return summaries.all()
+
+    async def get_page_by_user(
+        self,
+        user: User,
+        limit: int,
+        after: Optional[tuple[datetime, int]],
+        session: AsyncSession
+    ) -> tuple[list[Donation], Optional[tuple[datetime, int]]]:
+        """Получение страницы пожертвований пользователя."""
+        return await self.get_page(
+            limit, after, session, Donation.user_id == user.id
+        )
+
+    async def get_rows_by_user(
+        self,
+        columns: list[Column],
+        user: User,
+        session: AsyncSession
+    ) -> list[Row]:
+        """Получение строк пожертвований пользователя."""
+        return await self.get_rows(
+            columns, session, Donation.user_id == user.id
+        )
+
+    def stream_rows_by_user(
+        self,
+        columns: list[Column],
+        user: User,
+        session: AsyncSession
+    ) -> AsyncIterator[Row]:
+        """Потоковое получение строк пожертвований пользователя."""
+        return self.stream_rows(
+            columns, session, Donation.user_id == user.id
+        )
+
 
 donation_crud = CRUDDonation(Donation)
@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models import Investment
+
+
+class CRUDInvestment(
+    CRUDBase[Investment, BaseModel, BaseModel]
+):
+    """Класс CRUD-операций для модели Investment."""
+
+    async def get_by_donation(
+        self,
+        donation_id: int,
+        session: AsyncSession
+    ) -> list[Investment]:
+        """Получение записей журнала по пожертвованию."""
+        investments = await session.execute(
+            select(Investment).where(
+                Investment.donation_id == donation_id
+            ).order_by(Investment.id)
+        )
+        return investments.scalars().all()
+
+    async def get_by_project(
+        self,
+        project_id: int,
+        session: AsyncSession
+    ) -> list[Investment]:
+        """Получение записей журнала по проекту."""
+        investments = await session.execute(
+            select(Investment).where(
+                Investment.project_id == project_id
+            ).order_by(Investment.id)
+        )
+        return investments.scalars().all()
+
+
+investment_crud = CRUDInvestment(Investment)
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import TableVersion
+
+
+class CRUDTableVersion:
+    """Класс операций со счетчиками изменений таблиц."""
+
+    async def get(
+        self,
+        name: str,
+        session: AsyncSession
+    ) -> Optional[int]:
+        """Получение текущей версии таблицы."""
+        version = await session.execute(
+            select(TableVersion.version).where(TableVersion.name == name)
+        )
+        return version.scalars().first()
+
+
+table_version_crud = CRUDTableVersion()
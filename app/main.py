@@ -4,7 +4,10 @@ from fastapi import FastAPI
 
 from app.api.routers import main_router
 from app.core.config import LogConfig, settings
+from app.core.db import AsyncSessionLocal, dispose_engines
 from app.core.init_db import create_first_superuser
+from app.services.allocation_queue import allocation_queue
+from app.services.open_pool import open_pool_index
 
 dictConfig(LogConfig().dict())
 
@@ -17,3 +20,14 @@ app.include_router(main_router)
 @app.on_event('startup')
 async def startup() -> None:
     await create_first_superuser()
+    if settings.open_pool_index:
+        async with AsyncSessionLocal() as session:
+            await open_pool_index.load(session)
+    if settings.allocation_queue:
+        await allocation_queue.start()
+
+
+@app.on_event('shutdown')
+async def shutdown() -> None:
+    await allocation_queue.stop()
+    await dispose_engines()
@@ -1,3 +1,5 @@
 from app.models.charity_project import CharityProject # noqa
 from app.models.donation import Donation # noqa 
+from app.models.investment import Investment # noqa
+from app.models.table_version import TableVersion # noqa
 from app.models.user import User # noqa
@@ -1,8 +1,33 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, Float, Index, String, Text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 
 from app.core.constants import PROJECT_NAME_MAX_LENGTH
 from app.core.db import Base
-from app.models.mixins import CharityMixin
+from app.models.mixins import CharityMixin, opened_index
+
+
+class GatheringSeconds(FunctionElement):
+    """Время сбора средств в секундах: close_date - create_date."""
+    type = Float()
+    name = 'gathering_seconds'
+    inherit_cache = True
+
+
+@compiles(GatheringSeconds)
+def compile_gathering_seconds(element, compiler, **kwargs) -> str:
+    close_date, create_date = (
+        compiler.process(clause, **kwargs) for clause in element.clauses
+    )
+    return f'EXTRACT(EPOCH FROM {close_date} - {create_date})'
+
+
+@compiles(GatheringSeconds, 'sqlite')
+def compile_gathering_seconds_sqlite(element, compiler, **kwargs) -> str:
+    close_date, create_date = (
+        compiler.process(clause, **kwargs) for clause in element.clauses
+    )
+    return f'(julianday({close_date}) - julianday({create_date})) * 86400'
 
 
 class CharityProject(CharityMixin, Base):
@@ -13,3 +38,28 @@ class CharityProject(CharityMixin, Base):
         nullable=False
     )
     description = Column(Text, nullable=False)
+
+    @classmethod
+    def gathering_seconds(cls) -> GatheringSeconds:
+        """Выражение времени сбора средств закрытого проекта."""
+        return GatheringSeconds(cls.close_date, cls.create_date)
+
+    @classmethod
+    def closed_condition(cls):
+        """Условие закрытого проекта, совпадающее с условием индекса."""
+        return cls.fully_invested.is_(True)
+
+
+opened_index(CharityProject)
+Index(
+    'ix_charityproject_create_date_id',
+    CharityProject.create_date,
+    CharityProject.id
+)
+Index(
+    'ix_charityproject_gathering_time',
+    CharityProject.gathering_seconds(),
+    CharityProject.id,
+    postgresql_where=CharityProject.closed_condition(),
+    sqlite_where=CharityProject.closed_condition()
+)
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, ForeignKey, Integer, Text
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
 
 from app.core.db import Base
-from app.models.mixins import CharityMixin
+from app.models.mixins import CharityMixin, opened_index
 
 
 class Donation(CharityMixin, Base):
@@ -12,3 +12,10 @@ class Donation(CharityMixin, Base):
         nullable=False
     )
     comment = Column(Text)
+
+
+opened_index(Donation)
+Index('ix_donation_create_date_id', Donation.create_date, Donation.id)
+Index(
+    'ix_donation_user_id_create_date', Donation.user_id, Donation.create_date
+)
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import CheckConstraint, Column, DateTime, ForeignKey, Integer
+
+from app.core.db import Base
+from app.models.mixins import LocalTimestamp
+
+
+class Investment(Base):
+    """Модель записей журнала распределения средств."""
+    donation_id = Column(
+        Integer,
+        ForeignKey('donation.id', name='fk_investment_donation_id_donation'),
+        nullable=False,
+        index=True
+    )
+    project_id = Column(
+        Integer,
+        ForeignKey(
+            'charityproject.id',
+            name='fk_investment_project_id_charityproject'
+        ),
+        nullable=False,
+        index=True
+    )
+    amount = Column(Integer, nullable=False)
+    create_date = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.now,
+        server_default=LocalTimestamp()
+    )
+    __table_args__ = (
+        CheckConstraint('amount > 0', name='amount_positive'),
+    )
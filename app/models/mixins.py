@@ -1,6 +1,50 @@
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, CheckConstraint, Column, DateTime, Integer
+from sqlalchemy import (Boolean, CheckConstraint, Column, DateTime, Index,
+                        Integer, and_)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.core.config import settings
+from app.core.custom_types import AllocationState
+
+
+def get_allocation_state(
+    allocation_pending: bool
+) -> Optional[AllocationState]:
+    """Состояние распределения по признаку allocation_pending."""
+    if not settings.allocation_queue:
+        return None
+    if allocation_pending:
+        return AllocationState.PENDING
+    return AllocationState.ALLOCATED
+
+
+class LocalTimestamp(FunctionElement):
+    """
+    Локальное время сервера БД без часового пояса.
+
+    Используется как серверное значение по умолчанию для дат создания,
+    совпадающее по формату с datetime.now.
+    """
+    type = DateTime()
+    name = 'local_timestamp'
+    inherit_cache = True
+
+
+@compiles(LocalTimestamp)
+def compile_local_timestamp(element, compiler, **kwargs) -> str:
+    return 'LOCALTIMESTAMP'
+
+
+@compiles(LocalTimestamp, 'sqlite')
+def compile_local_timestamp_sqlite(element, compiler, **kwargs) -> str:
+    # %f дает секунды с миллисекундами, дополнение нулями приводит
+    # значение к формату с микросекундами, в котором SQLAlchemy хранит
+    # даты в SQLite.
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now', 'localtime')"
 
 
 class CharityMixin:
@@ -8,8 +52,15 @@ class CharityMixin:
     full_amount = Column(Integer, nullable=False)
     invested_amount = Column(Integer, nullable=False, default=0)
     fully_invested = Column(Boolean, nullable=False, default=False)
-    create_date = Column(DateTime, nullable=False, default=datetime.now)
+    create_date = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.now,
+        server_default=LocalTimestamp()
+    )
     close_date = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1)
+    allocation_pending = Column(Boolean, nullable=False, default=False)
     __table_args__ = (
         CheckConstraint(
             'full_amount >= invested_amount',
@@ -24,3 +75,33 @@ class CharityMixin:
             name='invested_amount_not_negative'
         ),
     )
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {'version_id_col': cls.version}
+
+    @property
+    def allocation_state(self) -> Optional[AllocationState]:
+        """Состояние распределения, если включена очередь распределения."""
+        return get_allocation_state(self.allocation_pending)
+
+
+def opened_index(model: type[CharityMixin]) -> Index:
+    """
+    Частичный индекс открытых объектов по (create_date, id).
+
+    Условие индекса совпадает с CRUDBase.opened_condition, поэтому
+    выборка открытых объектов в порядке распределения читает только
+    открытые строки без сортировки.
+    """
+    opened = and_(
+        model.fully_invested.is_(False),
+        model.allocation_pending.is_(False)
+    )
+    return Index(
+        f'ix_{model.__tablename__}_opened',
+        model.create_date,
+        model.id,
+        postgresql_where=opened,
+        sqlite_where=opened
+    )
@@ -0,0 +1,94 @@
+from secrets import randbits
+
+from sqlalchemy import BigInteger, Column, String, event, update
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.orm.query import FromStatement
+
+from app.core.db import Base
+
+VERSIONED_TABLES = ('charityproject', 'donation')
+CHANGED_TABLES_KEY = 'changed_tables'
+
+
+def initial_version() -> int:
+    """
+    Начальное значение счетчика.
+
+    Выбирается случайно, чтобы версии пересозданной таблицы
+    не совпадали с версиями, закешированными до пересоздания.
+    """
+    return randbits(48)
+
+
+class TableVersion(Base):
+    """
+    Модель счетчиков изменений таблиц.
+
+    Счетчик таблицы из VERSIONED_TABLES увеличивается в той же
+    транзакции, что и любая запись в таблицу через сессию.
+    """
+    name = Column(String(64), unique=True, nullable=False)
+    version = Column(BigInteger, nullable=False)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def seed_table_versions(target, connection, **kwargs) -> None:
+    """Создание счетчиков при создании таблицы."""
+    connection.execute(target.insert(), [
+        dict(name=name, version=initial_version())
+        for name in VERSIONED_TABLES
+    ])
+
+
+def collect_changed_tables(session: Session, tables) -> None:
+    """Учет таблиц, измененных в текущей транзакции."""
+    changed = {table for table in tables if table in VERSIONED_TABLES}
+    if changed:
+        session.info.setdefault(CHANGED_TABLES_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_flushed_tables(session: Session, flush_context) -> None:
+    """Учет таблиц, измененных при flush."""
+    collect_changed_tables(session, (
+        obj.__tablename__
+        for objs in (session.new, session.dirty, session.deleted)
+        for obj in objs
+    ))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def collect_executed_tables(orm_execute_state: ORMExecuteState) -> None:
+    """
+    Учет таблиц, измененных запросами INSERT/UPDATE/DELETE в обход flush.
+
+    Запрос с RETURNING, загружающий ORM-объекты через
+    select().from_statement(), проверяется по вложенному запросу.
+    """
+    statement = orm_execute_state.statement
+    if isinstance(statement, FromStatement):
+        statement = statement.element
+    if statement.is_dml:
+        collect_changed_tables(
+            orm_execute_state.session, (statement.table.name,)
+        )
+
+
+@event.listens_for(Session, 'before_commit')
+def bump_table_versions(session: Session) -> None:
+    """Увеличение счетчиков измененных таблиц перед фиксацией."""
+    session.flush()
+    changed = session.info.pop(CHANGED_TABLES_KEY, None)
+    if changed:
+        table = TableVersion.__table__
+        session.execute(
+            update(table).where(
+                table.c.name.in_(sorted(changed))
+            ).values(version=table.c.version + 1)
+        )
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_changed_tables(session: Session, previous_transaction) -> None:
+    """Сброс учтенных таблиц при откате транзакции."""
+    session.info.pop(CHANGED_TABLES_KEY, None)
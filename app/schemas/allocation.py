@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class AllocationQueueMetrics(BaseModel):
+    """Схема для получения метрик очереди распределения."""
+    enabled: bool
+    depth: int
+    batches: int
+    allocated: int
+    last_batch_size: int
+    max_batch_size: int
+    failed_batches: int
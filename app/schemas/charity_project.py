@@ -5,6 +5,7 @@ from pydantic import (BaseModel, Extra, Field, PositiveInt, root_validator,
                       validator)
 
 from app.core.constants import MIN_ANY_STR_LENGTH, PROJECT_NAME_MAX_LENGTH
+from app.core.custom_types import AllocationState
 
 
 class CharityProjectBase(BaseModel):
@@ -49,11 +50,24 @@ class CharityProjectDB(CharityProjectCreate):
     fully_invested: bool
     create_date: datetime
     close_date: Optional[datetime]
+    allocation_state: Optional[AllocationState]
 
     class Config:
         orm_mode = True
 
 
+class CharityProjectImportError(BaseModel):
+    """Схема для ошибки в строке файла импорта проектов."""
+    line: int
+    detail: str
+
+
+class CharityProjectImportResult(BaseModel):
+    """Схема для результата импорта проектов."""
+    created: int
+    errors: list[CharityProjectImportError]
+
+
 class CharityProjectReadClosed(BaseModel):
     """Схема для отображения данных о закрытых проектах."""
     name: str
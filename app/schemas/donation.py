@@ -3,6 +3,8 @@ from typing import Optional
 
 from pydantic import BaseModel, Extra, PositiveInt
 
+from app.core.custom_types import AllocationState
+
 
 class DonationCreate(BaseModel):
     """Схема для создания пожертвований."""
@@ -23,9 +25,28 @@ class DonationDB(DonationCreate):
         orm_mode = True
 
 
+class DonationSummary(BaseModel):
+    """Схема для сводки по пожертвованиям."""
+    count: int
+    total_donated: int
+    total_invested: int
+    open_amount: int
+    first_donation_date: Optional[datetime]
+    last_donation_date: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class DonationUserSummary(DonationSummary):
+    """Схема для сводки по пожертвованиям одного пользователя."""
+    user_id: int
+
+
 class DonationDBFull(DonationDB):
     """Расширенная схема для получения данных о пожертвованиях."""
     user_id: int
     invested_amount: int
     fully_invested: bool
     close_date: Optional[datetime]
+    allocation_state: Optional[AllocationState]
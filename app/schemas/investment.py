@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class InvestmentDB(BaseModel):
+    """Схема для получения записей журнала распределения средств."""
+    donation_id: int
+    project_id: int
+    amount: int
+    create_date: datetime
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,11 @@
+from typing import Generic, Optional, TypeVar
+
+from pydantic.generics import GenericModel
+
+ItemType = TypeVar('ItemType')
+
+
+class Page(GenericModel, Generic[ItemType]):
+    """Схема для страницы списка с курсором следующей страницы."""
+    items: list[ItemType]
+    next_cursor: Optional[str]
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from typing import Optional, Sequence, Type, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.crud import charity_project_crud, donation_crud
+from app.models import CharityProject, Donation
+from app.services.investments import (ModelType, allocate, invest_in_order,
+                                      invest_with_retry)
+
+logger = logging.getLogger('main_logger')
+
+CRUDS = {
+    CharityProject: charity_project_crud,
+    Donation: donation_crud,
+}
+
+
+class AllocationQueue:
+    """
+    Очередь фонового распределения средств.
+
+    Эндпоинты сохраняют объект с признаком allocation_pending и ставят его
+    в очередь. Воркер собирает все объекты, поступившие в течение
+    settings.allocation_window секунд (не более
+    settings.allocation_batch_size), и распределяет их одной транзакцией
+    в порядке поступления. Пачка, распределение которой завершилось
+    ошибкой, возвращается в очередь после паузы, растущей с каждой
+    ошибкой подряд от settings.allocation_retry_delay до
+    settings.allocation_retry_max_delay секунд.
+    """
+
+    def __init__(self, session_factory: sessionmaker = AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.allocated = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.failed_batches = 0
+        self.consecutive_failures = 0
+
+    @property
+    def depth(self) -> int:
+        """Количество объектов, ожидающих распределения."""
+        if self.queue is None:
+            return 0
+        return self.queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        """Запущен ли воркер очереди."""
+        return self.worker is not None
+
+    def put(self, obj: Union[CharityProject, Donation]) -> None:
+        """Постановка объекта в очередь."""
+        self.queue.put_nowait((type(obj), obj.id))
+
+    async def submit(
+        self,
+        allocated: Sequence[ModelType],
+        session: AsyncSession
+    ) -> Sequence[ModelType]:
+        """Сохранение объектов в состоянии ожидания и постановка в очередь."""
+        if not allocated:
+            return allocated
+        for obj in allocated:
+            obj.allocation_pending = True
+        await session.commit()
+        for obj in allocated:
+            self.put(obj)
+        return allocated
+
+    async def load_batch(
+        self,
+        batch: list[tuple[Type[ModelType], int]],
+        session: AsyncSession
+    ) -> list[ModelType]:
+        """Загрузка объектов пачки с сохранением порядка поступления."""
+        loaded = {}
+        for model, crud in CRUDS.items():
+            obj_ids = [obj_id for key, obj_id in batch if key is model]
+            if obj_ids:
+                db_objs = await crud.get_multi_by_ids(
+                    obj_ids=obj_ids, session=session
+                )
+                loaded.update(
+                    ((model, db_obj.id), db_obj) for db_obj in db_objs
+                )
+        return [loaded[key] for key in batch if key in loaded]
+
+    async def allocate_batch(
+        self,
+        batch: list[tuple[Type[ModelType], int]]
+    ) -> None:
+        """Распределение пачки объектов одной транзакцией."""
+        async with self.session_factory() as session:
+            allocated = await self.load_batch(batch=batch, session=session)
+            await invest_with_retry(
+                allocated=allocated,
+                session=session,
+                invest_func=invest_in_order
+            )
+        self.batches += 1
+        self.allocated += len(allocated)
+        self.last_batch_size = len(allocated)
+        self.max_batch_size = max(self.max_batch_size, len(allocated))
+
+    async def collect_batch(self) -> list[tuple[Type[ModelType], int]]:
+        """Ожидание первого объекта и сбор пачки в пределах окна."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + settings.allocation_window
+        while len(batch) < settings.allocation_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self.queue.get(), timeout)
+                )
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def retry_delay(self) -> float:
+        """Пауза перед повтором пачки после очередной ошибки подряд."""
+        delay = settings.allocation_retry_delay * 2 ** (
+            self.consecutive_failures - 1
+        )
+        return min(delay, settings.allocation_retry_max_delay)
+
+    async def run(self) -> None:
+        """Основной цикл воркера."""
+        while True:
+            batch = await self.collect_batch()
+            try:
+                await self.allocate_batch(batch)
+                self.consecutive_failures = 0
+            except Exception:
+                self.failed_batches += 1
+                self.consecutive_failures += 1
+                delay = self.retry_delay()
+                logger.exception(
+                    'Ошибка распределения пачки из %s объектов, повтор '
+                    'через %s с.', len(batch), delay
+                )
+                # Объекты возвращаются в очередь до вызова task_done,
+                # чтобы join дожидался их распределения.
+                await asyncio.sleep(delay)
+                for item in batch:
+                    self.queue.put_nowait(item)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def start(self) -> None:
+        """Запуск воркера и постановка в очередь ожидающих объектов."""
+        self.queue = asyncio.Queue()
+        async with self.session_factory() as session:
+            pending = []
+            for crud in CRUDS.values():
+                pending.extend(await crud.get_pending(session))
+        for obj in sorted(pending, key=lambda obj: obj.create_date):
+            self.put(obj)
+        self.worker = asyncio.create_task(self.run())
+
+    async def join(self) -> None:
+        """Ожидание обработки всех объектов очереди."""
+        await self.queue.join()
+
+    async def stop(self) -> None:
+        """Остановка воркера."""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        self.worker = None
+
+
+allocation_queue = AllocationQueue()
+
+
+async def schedule_allocation(
+    allocated: Sequence[ModelType],
+    session: AsyncSession
+) -> Sequence[ModelType]:
+    """
+    Распределение средств сразу или через очередь распределения.
+
+    Способ выбирается настройкой allocation_queue. Если воркер очереди не
+    запущен (например, при импорте из командной строки), средства
+    распределяются сразу, иначе объекты остались бы в ожидании.
+    """
+    if settings.allocation_queue and allocation_queue.running:
+        return await allocation_queue.submit(
+            allocated=allocated, session=session
+        )
+    return await allocate(allocated=allocated, session=session)
@@ -1,15 +1,27 @@
 from datetime import datetime
-from typing import TypeVar, Union
+from itertools import groupby
+from typing import (AsyncIterator, Awaitable, Callable, Sequence, TypeVar,
+                    Union)
 
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.core.config import settings
 from app.core.db import Base
 from app.crud.charity_project import CRUDCharityProject, charity_project_crud
 from app.crud.donation import CRUDDonation, donation_crud
+from app.crud.investment import investment_crud
 from app.models import CharityProject, Donation
+from app.services.open_pool import open_pool_index
 
 ModelType = TypeVar('ModelType', bound=Base)
 
+LedgerEntry = tuple[ModelType, int, int]
+
+INVESTMENT_CONFLICTS = (OperationalError, StaleDataError)
+
 
 def close_object(
     object: Union[CharityProject, Donation]
@@ -19,6 +31,177 @@ def close_object(
     object.fully_invested = True
 
 
+def transfer(
+    allocated: Union[CharityProject, Donation],
+    recipient: Union[CharityProject, Donation]
+) -> int:
+    """
+    Перевод средств от распределяемого объекта получателю.
+
+    Возвращает переведенную сумму. Если переводить нечего, объекты
+    не изменяются.
+    """
+    distribute = allocated.full_amount - (allocated.invested_amount or 0)
+    recieve = recipient.full_amount - (recipient.invested_amount or 0)
+    add = min(distribute, recieve)
+    if add <= 0:
+        return 0
+    allocated.invested_amount = (allocated.invested_amount or 0) + add
+    recipient.invested_amount = (recipient.invested_amount or 0) + add
+    if distribute >= recieve:
+        close_object(recipient)
+    if distribute <= recieve:
+        close_object(allocated)
+    return add
+
+
+def split_shares(
+    allocated: Sequence[ModelType],
+    shares: list[tuple[int, int]],
+    ledger: list[LedgerEntry]
+) -> None:
+    """
+    Раскладка сумм, полученных получателями, по объектам allocated.
+
+    Объекты allocated обслуживаются по очереди в переданном порядке,
+    каждая пара (объект, получатель, сумма) записывается в ledger.
+    """
+    shares = iter(shares)
+    recipient_id, share = next(shares, (None, 0))
+    for obj in allocated:
+        while recipient_id is not None and not obj.fully_invested:
+            invested_amount = obj.invested_amount or 0
+            add = min(share, obj.full_amount - invested_amount)
+            obj.invested_amount = invested_amount + add
+            if add:
+                ledger.append((obj, recipient_id, add))
+            share -= add
+            if obj.invested_amount == obj.full_amount:
+                close_object(obj)
+            if not share:
+                recipient_id, share = next(shares, (None, 0))
+
+
+async def record_investments(
+    ledger: list[LedgerEntry],
+    session: AsyncSession
+) -> None:
+    """
+    Запись журнала распределения одним пакетным INSERT.
+
+    Перед записью выполняется flush, чтобы новые объекты получили id.
+    """
+    if not ledger:
+        return
+    await session.flush()
+    rows = []
+    for obj, recipient_id, amount in ledger:
+        if isinstance(obj, Donation):
+            rows.append(dict(
+                donation_id=obj.id, project_id=recipient_id, amount=amount
+            ))
+        else:
+            rows.append(dict(
+                donation_id=recipient_id, project_id=obj.id, amount=amount
+            ))
+    await investment_crud.create_multi(rows=rows, session=session)
+
+
+def get_recipients_crud(
+    allocated: Union[CharityProject, Donation]
+) -> Union[CRUDCharityProject, CRUDDonation]:
+    """Получение CRUD-объекта для получателей средств."""
+    if isinstance(allocated, CharityProject):
+        return donation_crud
+    if isinstance(allocated, Donation):
+        return charity_project_crud
+    raise TypeError(
+        'В параметр allocated передан объект недопустимого класса'
+    )
+
+
+def get_recipients(
+    crud: Union[CRUDCharityProject, CRUDDonation],
+    amount: int,
+    session: AsyncSession
+) -> AsyncIterator[Union[CharityProject, Donation]]:
+    """
+    Открытые получатели в порядке create_date, id.
+
+    При включенной настройке open_pool_index получатели выбираются
+    по индексу в памяти, иначе потоково читаются из БД.
+    """
+    if settings.open_pool_index:
+        return open_pool_index.iterate(
+            crud=crud, amount=amount, session=session
+        )
+    return crud.stream_opened(session)
+
+
+async def save_recipients(
+    crud: Union[CRUDCharityProject, CRUDDonation],
+    recipients: list[Union[CharityProject, Donation]],
+    session: AsyncSession
+) -> None:
+    """Пакетная запись получателей и учет изменений в индексе пула."""
+    await crud.save_invested(db_objs=recipients, session=session)
+    open_pool_index.collect(session=session.sync_session, objs=recipients)
+
+
+async def invest_python(
+    allocated: ModelType,
+    session: AsyncSession,
+    ledger: list[LedgerEntry]
+) -> ModelType:
+    """
+    Распределение средств в цикле по ORM-объектам.
+
+    Эталонная реализация: открытые получатели подгружаются в сессию
+    порциями и обходятся по одному, пока не исчерпан объект allocated.
+    Измененные получатели записываются одним пакетным UPDATE.
+    """
+    crud = get_recipients_crud(allocated)
+    recipients = get_recipients(
+        crud=crud,
+        amount=allocated.full_amount - (allocated.invested_amount or 0),
+        session=session
+    )
+    touched = []
+    try:
+        async for recipient in recipients:
+            touched.append(recipient)
+            add = transfer(allocated=allocated, recipient=recipient)
+            if add:
+                ledger.append((allocated, recipient.id, add))
+            if allocated.fully_invested:
+                break
+    finally:
+        await recipients.aclose()
+    await save_recipients(crud=crud, recipients=touched, session=session)
+    return allocated
+
+
+async def invest_sql(
+    allocated: ModelType,
+    session: AsyncSession,
+    ledger: list[LedgerEntry]
+) -> ModelType:
+    """
+    Распределение средств на стороне БД.
+
+    Разбиение суммы по получателям вычисляется оконной функцией,
+    получатели обновляются массовыми UPDATE без загрузки в сессию.
+    """
+    crud = get_recipients_crud(allocated)
+    shares = await crud.distribute_to_opened(
+        amount=allocated.full_amount - (allocated.invested_amount or 0),
+        session=session
+    )
+    open_pool_index.invalidate(session=session, model=crud.model)
+    split_shares(allocated=[allocated], shares=shares, ledger=ledger)
+    return allocated
+
+
 async def invest(
     allocated: ModelType,
     session: AsyncSession
@@ -29,32 +212,196 @@ async def invest(
     В аргумент allocated передается объект пожертования или проекта.
     При получении пожертвования распределяет средства по открытым проектам.
     При получении проекта вносит в него средства из открытых пожертвований.
+    Способ распределения задается настройкой investment_engine.
+    Переводы записываются в журнал распределения.
     """
-    crud: Union[CRUDCharityProject, CRUDDonation]
-    if isinstance(allocated, CharityProject):
-        crud = donation_crud
-    elif isinstance(allocated, Donation):
-        crud = charity_project_crud
+    ledger = []
+    if settings.investment_engine == 'sql':
+        await invest_sql(allocated=allocated, session=session, ledger=ledger)
     else:
-        raise TypeError(
-            'В параметр allocated передан объект недопустимого класса'
+        await invest_python(
+            allocated=allocated, session=session, ledger=ledger
         )
-    recipients = await crud.get_opened(session)
-    if not recipients:
+    await record_investments(ledger=ledger, session=session)
+    return allocated
+
+
+async def invest_many_python(
+    allocated: Sequence[ModelType],
+    session: AsyncSession,
+    ledger: list[LedgerEntry]
+) -> Sequence[ModelType]:
+    """Распределение нескольких объектов в цикле по ORM-объектам."""
+    crud = get_recipients_crud(allocated[0])
+    queue = iter(allocated)
+    current = next(queue)
+    recipients = get_recipients(
+        crud=crud,
+        amount=sum(
+            obj.full_amount - (obj.invested_amount or 0) for obj in allocated
+        ),
+        session=session
+    )
+    touched = []
+    try:
+        async for recipient in recipients:
+            touched.append(recipient)
+            while current is not None and not recipient.fully_invested:
+                add = transfer(allocated=current, recipient=recipient)
+                if add:
+                    ledger.append((current, recipient.id, add))
+                if current.fully_invested:
+                    current = next(queue, None)
+            if current is None:
+                break
+    finally:
+        await recipients.aclose()
+    await save_recipients(crud=crud, recipients=touched, session=session)
+    return allocated
+
+
+async def invest_many_sql(
+    allocated: Sequence[ModelType],
+    session: AsyncSession,
+    ledger: list[LedgerEntry]
+) -> Sequence[ModelType]:
+    """
+    Распределение нескольких объектов на стороне БД.
+
+    Суммарный остаток распределяется по получателям одним набором
+    запросов, затем распределенная сумма раскладывается по объектам
+    allocated в порядке очереди.
+    """
+    crud = get_recipients_crud(allocated[0])
+    shares = await crud.distribute_to_opened(
+        amount=sum(
+            obj.full_amount - (obj.invested_amount or 0) for obj in allocated
+        ),
+        session=session
+    )
+    open_pool_index.invalidate(session=session, model=crud.model)
+    split_shares(allocated=allocated, shares=shares, ledger=ledger)
+    return allocated
+
+
+async def invest_many(
+    allocated: Sequence[ModelType],
+    session: AsyncSession
+) -> Sequence[ModelType]:
+    """
+    Распределение нескольких однотипных объектов за один проход.
+
+    Объекты из allocated обслуживаются по очереди в переданном порядке,
+    получатели обходятся один раз в порядке создания.
+    Полностью распределенные объекты пропускаются.
+    Переводы всего прохода записываются в журнал одним INSERT.
+    """
+    opened = [obj for obj in allocated if not obj.fully_invested]
+    if not opened:
         return allocated
-    for recipient in recipients:
-        distribute = allocated.full_amount - (allocated.invested_amount or 0)
-        recieve = recipient.full_amount - (recipient.invested_amount or 0)
-        add = min(distribute, recieve)
-        allocated.invested_amount = (allocated.invested_amount or 0) + add
-        recipient.invested_amount = (recipient.invested_amount or 0) + add
-        if distribute > recieve:
-            close_object(recipient)
-        elif distribute < recieve:
-            close_object(allocated)
-            break
-        else:
-            close_object(recipient)
-            close_object(allocated)
+    ledger = []
+    if settings.investment_engine == 'sql':
+        await invest_many_sql(
+            allocated=opened, session=session, ledger=ledger
+        )
+    else:
+        await invest_many_python(
+            allocated=opened, session=session, ledger=ledger
+        )
+    await record_investments(ledger=ledger, session=session)
+    return allocated
+
+
+async def invest_in_order(
+    allocated: Sequence[Union[CharityProject, Donation]],
+    session: AsyncSession
+) -> Sequence[Union[CharityProject, Donation]]:
+    """
+    Распределение разнотипных объектов в порядке поступления.
+
+    Подряд идущие однотипные объекты распределяются одним проходом.
+    Перед проходом с объектов снимается признак ожидания распределения,
+    после чего они становятся доступны как получатели следующих проходов.
+    """
+    for _, run in groupby(allocated, key=type):
+        run = list(run)
+        for obj in run:
+            obj.allocation_pending = False
+        await session.flush()
+        await invest_many(
+            allocated=[obj for obj in run if not obj.fully_invested],
+            session=session
+        )
+    return allocated
+
+
+async def invest_with_retry(
+    allocated: Sequence[ModelType],
+    session: AsyncSession,
+    invest_func: Callable[
+        [Sequence[ModelType], AsyncSession], Awaitable[Sequence[ModelType]]
+    ] = invest_many
+) -> None:
+    """
+    Распределение средств и фиксация транзакции.
+
+    При конфликте с параллельной транзакцией (StaleDataError или
+    блокировка БД) транзакция откатывается и распределение повторяется,
+    всего не более settings.investment_retries попыток.
+    """
+    initial_state = [
+        (obj, obj.invested_amount, obj.fully_invested, obj.close_date)
+        for obj in allocated
+    ]
+    for attempt in range(1, settings.investment_retries + 1):
+        try:
+            await invest_func(allocated, session)
+            await session.commit()
+            return
+        except INVESTMENT_CONFLICTS:
+            await session.rollback()
+            if attempt == settings.investment_retries:
+                raise
+        for obj, invested_amount, fully_invested, close_date in initial_state:
+            if inspect(obj).transient:
+                obj.id = None
+                obj.invested_amount = invested_amount
+                obj.fully_invested = fully_invested
+                obj.close_date = close_date
+                session.add(obj)
+            else:
+                await session.refresh(obj)
+
+
+async def allocate(
+    allocated: Sequence[ModelType],
+    session: AsyncSession
+) -> Sequence[ModelType]:
+    """
+    Распределение средств и фиксация транзакции.
+
+    Сессии не сбрасывают состояние объектов при фиксации
+    (expire_on_commit=False), поэтому объекты не перечитываются из БД.
+    В режиме investment_locking параллельные транзакции пропускают
+    заблокированных получателей, поэтому нераспределенный остаток
+    распределяется дополнительными проходами, пока есть открытые
+    получатели.
+    """
+    if not allocated:
+        return allocated
+    if not settings.investment_locking:
+        await invest_many(allocated=allocated, session=session)
+        await session.commit()
+        return allocated
+    recipients_crud = get_recipients_crud(allocated[0])
+    for _ in range(settings.investment_retries):
+        await invest_with_retry(
+            allocated=[obj for obj in allocated if not obj.fully_invested],
+            session=session
+        )
+        if (
+            all(obj.fully_invested for obj in allocated) or
+            not await recipients_crud.has_opened(session)
+        ):
             break
     return allocated
@@ -0,0 +1,283 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import chain
+from typing import AsyncIterator, Iterable, Optional, Type, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import charity_project_crud, donation_crud
+from app.crud.charity_project import CRUDCharityProject
+from app.crud.donation import CRUDDonation
+from app.models import CharityProject, Donation
+
+CHANGES_KEY = 'open_pool_changes'
+INVALIDATED_KEY = 'open_pool_invalidated'
+
+
+class OpenPool:
+    """
+    Открытые объекты одной модели в порядке create_date, id.
+
+    Даты создания, id и остатки хранятся в компактных массивах,
+    суммарный остаток поддерживается при каждом изменении пула.
+    """
+
+    def __init__(self) -> None:
+        self.loaded = False
+        self.dates = array('d')
+        self.ids = array('q')
+        self.remaining = array('q')
+        self.total = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def fill(self, rows: list[tuple[int, datetime, int]]) -> None:
+        """Заполнение пула упорядоченными строками (id, дата, остаток)."""
+        self.dates = array('d', (row[1].timestamp() for row in rows))
+        self.ids = array('q', (row[0] for row in rows))
+        self.remaining = array('q', (row[2] for row in rows))
+        self.total = sum(self.remaining)
+        self.loaded = True
+
+    def bisect(self, obj_id: int, timestamp: float) -> int:
+        """Позиция объекта в порядке create_date, id."""
+        low = bisect_left(self.dates, timestamp)
+        high = bisect_right(self.dates, timestamp, low)
+        return bisect_left(self.ids, obj_id, low, high)
+
+    def position(self, obj_id: int, create_date: datetime) -> Optional[int]:
+        """Позиция объекта в пуле."""
+        position = self.bisect(obj_id, create_date.timestamp())
+        if position < len(self.ids) and self.ids[position] == obj_id:
+            return position
+        return None
+
+    def discard(self, obj_id: int, create_date: datetime) -> None:
+        """Удаление объекта из пула."""
+        position = self.position(obj_id, create_date)
+        if position is not None:
+            self.total -= self.remaining[position]
+            del self.dates[position]
+            del self.ids[position]
+            del self.remaining[position]
+
+    def put(self, obj_id: int, create_date: datetime, remaining: int) -> None:
+        """Добавление объекта в пул или обновление его остатка."""
+        timestamp = create_date.timestamp()
+        position = self.bisect(obj_id, timestamp)
+        if position < len(self.ids) and self.ids[position] == obj_id:
+            self.total += remaining - self.remaining[position]
+            self.remaining[position] = remaining
+            return
+        self.dates.insert(position, timestamp)
+        self.ids.insert(position, obj_id)
+        self.remaining.insert(position, remaining)
+        self.total += remaining
+
+    def head(self, amount: int) -> list[tuple[int, int]]:
+        """Первые объекты пула, остатков которых хватает на сумму amount."""
+        picked = []
+        for obj_id, remaining in zip(self.ids, self.remaining):
+            if amount <= 0:
+                break
+            picked.append((obj_id, remaining))
+            amount -= remaining
+        return picked
+
+
+class OpenPoolIndex:
+    """
+    Индекс открытых проектов и пожертвований в памяти процесса.
+
+    Индекс обновляется после фиксации транзакций по изменениям,
+    собранным при flush ORM-сессий. Выбранные из индекса получатели
+    сверяются с БД, при расхождении индекс перестраивается.
+    """
+
+    def __init__(self) -> None:
+        self.pools = {
+            CharityProject: OpenPool(),
+            Donation: OpenPool(),
+        }
+        self.rebuilds = 0
+
+    async def rebuild(
+        self,
+        crud: Union[CRUDCharityProject, CRUDDonation],
+        session: AsyncSession
+    ) -> None:
+        """Загрузка пула модели из БД."""
+        self.pools[crud.model].fill(
+            await crud.get_opened_remaining(session)
+        )
+        self.rebuilds += 1
+
+    async def load(self, session: AsyncSession) -> None:
+        """Загрузка всех пулов из БД."""
+        for crud in (charity_project_crud, donation_crud):
+            await self.rebuild(crud=crud, session=session)
+
+    async def verify(
+        self,
+        crud: Union[CRUDCharityProject, CRUDDonation],
+        session: AsyncSession
+    ) -> bool:
+        """
+        Сверка количества и суммарного остатка пула с БД.
+
+        При расхождении пул перестраивается.
+        """
+        pool = self.pools[crud.model]
+        if (len(pool), pool.total) == await crud.get_opened_totals(session):
+            return True
+        await self.rebuild(crud=crud, session=session)
+        return False
+
+    async def pick(
+        self,
+        crud: Union[CRUDCharityProject, CRUDDonation],
+        amount: int,
+        session: AsyncSession
+    ) -> Optional[list[Union[CharityProject, Donation]]]:
+        """
+        Загрузка получателей для суммы amount по данным пула.
+
+        Если остатков выбранных объектов не хватает на сумму amount,
+        пул сверяется с БД целиком: объекты, открытые другим процессом
+        в обход индекса, иначе не были бы найдены. Возвращает None, если
+        выбранные объекты не совпадают с БД.
+        """
+        pool = self.pools[crud.model]
+        if not pool.loaded:
+            await self.rebuild(crud=crud, session=session)
+        picked = pool.head(amount)
+        if sum(remaining for _, remaining in picked) < amount:
+            if not await self.verify(crud=crud, session=session):
+                picked = pool.head(amount)
+        if not picked:
+            return []
+        recipients = {
+            recipient.id: recipient
+            for recipient in await crud.get_multi_by_ids(
+                obj_ids=[obj_id for obj_id, _ in picked], session=session
+            )
+        }
+        for obj_id, remaining in picked:
+            recipient = recipients.get(obj_id)
+            if (
+                recipient is None or
+                recipient.fully_invested or
+                recipient.allocation_pending or
+                recipient.full_amount - recipient.invested_amount != remaining
+            ):
+                return None
+        return [recipients[obj_id] for obj_id, _ in picked]
+
+    async def iterate(
+        self,
+        crud: Union[CRUDCharityProject, CRUDDonation],
+        amount: int,
+        session: AsyncSession
+    ) -> AsyncIterator[Union[CharityProject, Donation]]:
+        """
+        Получатели для суммы amount в порядке create_date, id.
+
+        При расхождении с БД пул перестраивается и выбор повторяется,
+        при повторном расхождении используется потоковый обход БД.
+        """
+        recipients = await self.pick(crud=crud, amount=amount, session=session)
+        if recipients is None:
+            await self.rebuild(crud=crud, session=session)
+            recipients = await self.pick(
+                crud=crud, amount=amount, session=session
+            )
+        if recipients is None:
+            recipients = crud.stream_opened(session)
+            try:
+                async for recipient in recipients:
+                    yield recipient
+            finally:
+                await recipients.aclose()
+            return
+        for recipient in recipients:
+            yield recipient
+
+    def invalidate(
+        self,
+        session: AsyncSession,
+        model: Type[Union[CharityProject, Donation]]
+    ) -> None:
+        """Пометка пула на перестроение после фиксации транзакции."""
+        session.sync_session.info.setdefault(INVALIDATED_KEY, set()).add(model)
+
+    def collect(
+        self,
+        session: Session,
+        objs: Iterable[Union[CharityProject, Donation]]
+    ) -> None:
+        """
+        Сбор изменений открытых объектов до фиксации транзакции.
+
+        Вызывается при flush сессии и после пакетной записи получателей
+        в обход flush. Для каждого объекта сохраняются дата создания и
+        остаток, остаток None означает удаление объекта из пула.
+        """
+        if not settings.open_pool_index:
+            return
+        changes = session.info.setdefault(CHANGES_KEY, {})
+        for obj in objs:
+            if type(obj) not in self.pools:
+                continue
+            if (
+                obj in session.deleted or
+                obj.fully_invested or
+                obj.allocation_pending
+            ):
+                changes[(type(obj), obj.id)] = (obj.create_date, None)
+            else:
+                changes[(type(obj), obj.id)] = (
+                    obj.create_date, obj.full_amount - obj.invested_amount
+                )
+
+    def apply(self, session: Session) -> None:
+        """Применение изменений зафиксированной транзакции к пулам."""
+        for model in session.info.pop(INVALIDATED_KEY, ()):
+            self.pools[model].loaded = False
+        changes = session.info.pop(CHANGES_KEY, {})
+        for (model, obj_id), (create_date, remaining) in changes.items():
+            pool = self.pools[model]
+            if remaining is None:
+                pool.discard(obj_id, create_date)
+            else:
+                pool.put(obj_id, create_date, remaining)
+
+
+open_pool_index = OpenPoolIndex()
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_open_pool_changes(session: Session, flush_context) -> None:
+    """Сбор изменений открытых объектов при flush."""
+    open_pool_index.collect(
+        session=session,
+        objs=chain(session.new, session.dirty, session.deleted)
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_open_pool_changes(session: Session) -> None:
+    """Обновление индекса после фиксации транзакции."""
+    if settings.open_pool_index:
+        open_pool_index.apply(session)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_open_pool_changes(session: Session, previous_transaction) -> None:
+    """Сброс несохраненных изменений при откате транзакции."""
+    session.info.pop(CHANGES_KEY, None)
+    session.info.pop(INVALIDATED_KEY, None)
@@ -0,0 +1,127 @@
+import csv
+import json
+from itertools import islice
+from typing import Iterable, Iterator, Union
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.validators import ErrorMessages
+from app.core.config import settings
+from app.crud import charity_project_crud
+from app.schemas.charity_project import CharityProjectCreate
+from app.services.allocation_queue import schedule_allocation
+from app.services.open_pool import open_pool_index
+
+ImportRow = tuple[int, Union[dict, str]]
+
+
+def read_rows(lines: Iterable[str], import_format: str) -> Iterator[ImportRow]:
+    """
+    Строки файла импорта с номерами.
+
+    Вместо словаря с данными для строки, которую не удалось разобрать,
+    возвращается текст ошибки.
+    """
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, 'Лишние значения в строке.'
+            else:
+                yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, f'Некорректный JSON: {error}'
+            continue
+        if isinstance(row, dict):
+            yield number, row
+        else:
+            yield number, 'Строка должна содержать JSON-объект.'
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Текст ошибки валидации строки."""
+    return '; '.join(
+        f'{".".join(map(str, item["loc"]))}: {item["msg"]}'
+        for item in error.errors()
+    )
+
+
+async def import_chunk(
+    chunk: list[ImportRow],
+    session: AsyncSession,
+    errors: list[dict]
+) -> int:
+    """
+    Валидация и сохранение порции строк.
+
+    Занятые названия проверяются одним запросом на порцию.
+    Возвращает количество созданных проектов.
+    """
+    valid = {}
+    for line, row in chunk:
+        if isinstance(row, str):
+            errors.append(dict(line=line, detail=row))
+            continue
+        try:
+            project = CharityProjectCreate.parse_obj(row)
+        except ValidationError as error:
+            errors.append(
+                dict(line=line, detail=format_validation_error(error))
+            )
+            continue
+        if project.name in valid:
+            errors.append(
+                dict(line=line, detail=ErrorMessages.NAME_DUPLICATE)
+            )
+            continue
+        valid[project.name] = (line, project)
+    for name in await charity_project_crud.get_existing_names(
+        names=list(valid), session=session
+    ):
+        line, _ = valid.pop(name)
+        errors.append(dict(line=line, detail=ErrorMessages.NAME_DUPLICATE))
+    await charity_project_crud.create_multi(
+        rows=[project.dict() for _, project in valid.values()],
+        session=session
+    )
+    await session.commit()
+    return len(valid)
+
+
+async def import_projects(
+    rows: Iterable[ImportRow],
+    session: AsyncSession,
+    chunk_size: int = settings.import_chunk_size
+) -> dict[str, Union[int, list[dict]]]:
+    """
+    Потоковый импорт проектов.
+
+    Строки валидируются и сохраняются порциями по chunk_size, каждая
+    порция фиксируется отдельной транзакцией. Ошибки в строках не
+    прерывают импорт. После сохранения всех порций средства
+    распределяются по новым проектам одним проходом.
+    """
+    last_id = await charity_project_crud.get_max_id(session)
+    errors = []
+    created = 0
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        created += await import_chunk(
+            chunk=chunk, session=session, errors=errors
+        )
+    imported = await charity_project_crud.get_opened_after(
+        obj_id=last_id, session=session
+    )
+    open_pool_index.collect(session=session.sync_session, objs=imported)
+    await schedule_allocation(allocated=imported, session=session)
+    return dict(
+        created=created,
+        errors=sorted(errors, key=lambda error: error['line'])
+    )
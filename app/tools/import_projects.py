@@ -0,0 +1,55 @@
+"""
+Импорт проектов из файла CSV или JSONL.
+
+Запуск: python -m app.tools.import_projects projects.csv [--chunk-size N]
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.services.project_import import import_projects, read_rows
+
+
+async def main(path: Path, import_format: str, chunk_size: int) -> None:
+    """Импорт файла и вывод отчета об ошибках."""
+    with open(path, encoding='utf-8-sig', newline='') as lines:
+        async with AsyncSessionLocal() as session:
+            report = await import_projects(
+                rows=read_rows(lines=lines, import_format=import_format),
+                session=session,
+                chunk_size=chunk_size
+            )
+    for error in report['errors']:
+        print(f'Строка {error["line"]}: {error["detail"]}')
+    print(
+        f'Создано проектов: {report["created"]}, '
+        f'строк с ошибками: {len(report["errors"])}'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Импорт проектов из файла CSV или JSONL.'
+    )
+    parser.add_argument('path', type=Path)
+    parser.add_argument(
+        '--format', choices=('csv', 'jsonl'), dest='import_format',
+        help='Формат файла, по умолчанию определяется по расширению.'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=settings.import_chunk_size,
+        help='Количество строк, сохраняемых одной транзакцией.'
+    )
+    args = parser.parse_args()
+    import_format = args.import_format or args.path.suffix.lstrip('.')
+    if import_format == 'ndjson':
+        import_format = 'jsonl'
+    if import_format not in ('csv', 'jsonl'):
+        parser.error('Поддерживаются только файлы .csv и .jsonl.')
+    asyncio.run(main(
+        path=args.path,
+        import_format=import_format,
+        chunk_size=args.chunk_size
+    ))
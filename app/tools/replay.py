@@ -0,0 +1,274 @@
+"""
+Пересчет распределения средств с нуля.
+
+Пожертвования и проекты читаются порциями в порядке create_date, id,
+сопоставляются по нарастающим итогам сумм (FIFO) и записываются
+обратно пакетными UPDATE. Журнал распределения пересобирается.
+
+Запуск: python -m app.tools.replay [--chunk-size N] [--dry-run]
+Перед запуском сервис следует остановить.
+"""
+import argparse
+import asyncio
+from bisect import bisect_right
+from datetime import datetime
+from itertools import accumulate
+from typing import Optional, Type, Union
+
+from sqlalchemy import bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models import CharityProject, Donation, Investment
+
+
+def match_segments(
+    donation_ends: list[int],
+    project_ends: list[int],
+    start: int,
+    stop: int
+) -> list[tuple[int, int, int]]:
+    """
+    Сопоставление отрезка [start, stop) нарастающих итогов.
+
+    В donation_ends и project_ends передаются нарастающие итоги сумм
+    (правые границы объектов). Границы обеих последовательностей
+    сливаются, и для левого конца каждого отрезка бинарным поиском
+    находятся пожертвование и проект, которым он принадлежит.
+    Возвращает тройки (индекс пожертвования, индекс проекта, сумма).
+    """
+    bounds = sorted({
+        start, stop,
+        *(end for end in donation_ends if start < end < stop),
+        *(end for end in project_ends if start < end < stop),
+    })
+    return [
+        (
+            bisect_right(donation_ends, left),
+            bisect_right(project_ends, left),
+            right - left
+        ) for left, right in zip(bounds, bounds[1:])
+    ]
+
+
+class ReplayStream:
+    """
+    Порционное чтение объектов одной модели и запись результатов.
+
+    В буфере хранятся прочитанные, но еще не пересчитанные объекты,
+    их нарастающие итоги и накопленные суммы вложений.
+    """
+
+    def __init__(
+        self,
+        model: Type[Union[CharityProject, Donation]],
+        session: AsyncSession,
+        chunk_size: int,
+        dry_run: bool
+    ) -> None:
+        self.model = model
+        self.session = session
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.after: Optional[tuple[datetime, int]] = None
+        self.exhausted = False
+        self.total = 0
+        self.rows: list[Row] = []
+        self.ends: list[int] = []
+        self.invested: list[int] = []
+        self.closed: list[Optional[datetime]] = []
+        self.updates: list[dict] = []
+        self.count = 0
+        self.changed = 0
+        self.delta = 0
+
+    async def read(self) -> None:
+        """Чтение следующей порции объектов."""
+        query = select(
+            self.model.id,
+            self.model.create_date,
+            self.model.full_amount,
+            self.model.invested_amount,
+            self.model.fully_invested,
+            self.model.close_date,
+            self.model.allocation_pending
+        ).order_by(
+            self.model.create_date, self.model.id
+        ).limit(self.chunk_size)
+        if self.after is not None:
+            query = query.where(
+                tuple_(self.model.create_date, self.model.id) > self.after
+            )
+        rows = (await self.session.execute(query)).all()
+        self.exhausted = len(rows) < self.chunk_size
+        if not rows:
+            return
+        self.after = (rows[-1].create_date, rows[-1].id)
+        self.rows.extend(rows)
+        self.ends.extend(
+            accumulate(
+                (row.full_amount for row in rows), initial=self.total
+            )
+        )
+        del self.ends[-len(rows) - 1]
+        self.total = self.ends[-1]
+        self.invested.extend(0 for _ in rows)
+        self.closed.extend(None for _ in rows)
+
+    async def fill(self) -> bool:
+        """Дочитывание порции, если буфер пуст. False, если данных нет."""
+        if not self.rows and not self.exhausted:
+            await self.read()
+        return bool(self.rows)
+
+    def invest(self, index: int, amount: int, date: datetime) -> None:
+        """Учет вложения суммы amount в объект буфера с индексом index."""
+        self.invested[index] += amount
+        if self.invested[index] == self.rows[index].full_amount:
+            self.closed[index] = max(self.rows[index].create_date, date)
+
+    async def finish(self, count: int) -> None:
+        """Запись результатов первых count объектов буфера."""
+        for row, invested, closed in zip(
+            self.rows[:count], self.invested[:count], self.closed[:count]
+        ):
+            fully_invested = invested == row.full_amount
+            if fully_invested and row.fully_invested:
+                closed = row.close_date
+            self.count += 1
+            self.delta += invested - row.invested_amount
+            if (
+                invested != row.invested_amount or
+                fully_invested != row.fully_invested or
+                closed != row.close_date or
+                row.allocation_pending
+            ):
+                self.changed += 1
+                self.updates.append(dict(
+                    obj_id=row.id,
+                    invested_amount=invested,
+                    fully_invested=fully_invested,
+                    close_date=closed
+                ))
+        for buffer in (self.rows, self.ends, self.invested, self.closed):
+            del buffer[:count]
+        if len(self.updates) >= self.chunk_size:
+            await self.flush()
+
+    async def finish_all(self) -> None:
+        """Запись результатов всех оставшихся объектов."""
+        while await self.fill():
+            await self.finish(len(self.rows))
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Запись накопленных изменений одним пакетным UPDATE."""
+        if self.updates and not self.dry_run:
+            table = self.model.__table__
+            await self.session.execute(
+                update(table).where(
+                    table.c.id == bindparam('obj_id')
+                ).values(
+                    version=table.c.version + 1,
+                    allocation_pending=False
+                ),
+                self.updates
+            )
+        self.updates = []
+
+
+async def replay(
+    session: AsyncSession,
+    chunk_size: int = settings.opened_chunk_size,
+    dry_run: bool = False
+) -> dict[str, Union[ReplayStream, int]]:
+    """
+    Пересчет вложенных сумм, признаков и дат закрытия всех объектов.
+
+    Возвращает потоки с итогами сверки по каждой модели и количество
+    записей журнала распределения. При dry_run изменения не пишутся.
+    """
+    donations, projects = (
+        ReplayStream(
+            model=model,
+            session=session,
+            chunk_size=chunk_size,
+            dry_run=dry_run
+        ) for model in (Donation, CharityProject)
+    )
+    investments = 0
+    if not dry_run:
+        await session.execute(delete(Investment))
+    position = 0
+    while await donations.fill() and await projects.fill():
+        stop = min(donations.ends[-1], projects.ends[-1])
+        ledger = []
+        for donation_index, project_index, amount in match_segments(
+            donation_ends=donations.ends,
+            project_ends=projects.ends,
+            start=position,
+            stop=stop
+        ):
+            donation = donations.rows[donation_index]
+            project = projects.rows[project_index]
+            date = max(donation.create_date, project.create_date)
+            donations.invest(donation_index, amount, date)
+            projects.invest(project_index, amount, date)
+            ledger.append(dict(
+                donation_id=donation.id,
+                project_id=project.id,
+                amount=amount,
+                create_date=date
+            ))
+        if ledger and not dry_run:
+            await session.execute(insert(Investment), ledger)
+        investments += len(ledger)
+        position = stop
+        for stream in (donations, projects):
+            await stream.finish(bisect_right(stream.ends, stop))
+    for stream in (donations, projects):
+        await stream.finish_all()
+    if dry_run:
+        await session.rollback()
+    else:
+        await session.commit()
+    return dict(
+        donations=donations, projects=projects, investments=investments
+    )
+
+
+async def main(chunk_size: int, dry_run: bool) -> None:
+    """Запуск пересчета и вывод отчета о расхождениях."""
+    async with AsyncSessionLocal() as session:
+        report = await replay(
+            session=session, chunk_size=chunk_size, dry_run=dry_run
+        )
+    for title, stream in (
+        ('Пожертвования', report['donations']),
+        ('Проекты', report['projects'])
+    ):
+        print(
+            f'{title}: всего {stream.count}, изменено {stream.changed}, '
+            f'изменение вложенной суммы {stream.delta:+d}'
+        )
+    print(f'Записей журнала распределения: {report["investments"]}')
+    if dry_run:
+        print('Пробный запуск, изменения не сохранены.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Пересчет распределения средств с нуля.'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=settings.opened_chunk_size,
+        help='Количество объектов, читаемых за один запрос.'
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='Только вывести расхождения, не сохраняя изменения.'
+    )
+    args = parser.parse_args()
+    asyncio.run(main(chunk_size=args.chunk_size, dry_run=args.dry_run))
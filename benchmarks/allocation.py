@@ -0,0 +1,253 @@
+"""
+Нагрузочный тест распределения средств.
+
+Создает БД с пулом открытых проектов и пожертвований, отправляет поток
+запросов POST /donation/ и POST /charity_project/ через ASGI-приложение
+и выводит пропускную способность и перцентили задержки. Результаты
+сравниваются с сохраненным базовым замером.
+
+Запуск:
+    python -m benchmarks.allocation --requests 2000 --pool 10000
+    python -m benchmarks.allocation --url postgresql+asyncpg://... --save
+
+Способ распределения задается обычными переменными окружения
+(INVESTMENT_ENGINE, OPEN_POOL_INDEX и т. д.). Указанная БД пересоздается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from statistics import quantiles
+
+BASELINES_DIR = Path(__file__).resolve().parent / 'baselines'
+DEFAULT_URL = 'sqlite+aiosqlite:///./benchmark.db'
+BENCHMARK_EMAIL = 'benchmark@example.com'
+SETTINGS_KEYS = (
+    'investment_engine',
+    'investment_locking',
+    'allocation_queue',
+    'open_pool_index',
+)
+
+
+def get_amounts(
+    rng: random.Random,
+    distribution: str,
+    mean: int,
+    count: int
+) -> list[int]:
+    """Суммы проектов/пожертвований с заданным распределением."""
+    if distribution == 'uniform':
+        values = (rng.uniform(1, 2 * mean) for _ in range(count))
+    elif distribution == 'lognormal':
+        values = (
+            rng.lognormvariate(0, 1) * mean / 1.65 for _ in range(count)
+        )
+    else:
+        values = (rng.paretovariate(2) * mean / 2 for _ in range(count))
+    return [max(1, round(value)) for value in values]
+
+
+async def prepare(args: argparse.Namespace, rng: random.Random):
+    """Пересоздание схемы, создание пользователя и пула открытых объектов."""
+    from sqlalchemy import insert, select
+
+    from app.core.db import (AsyncSessionLocal, Base, dispose_engines,
+                             engine)
+    from app.core.init_db import create_user
+    from app.models import CharityProject, Donation, User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await create_user(
+        email=BENCHMARK_EMAIL, password='benchmark', is_superuser=True
+    )
+    async with AsyncSessionLocal() as session:
+        user_id = await session.execute(
+            select(User.id).where(User.email == BENCHMARK_EMAIL)
+        )
+        user_id = user_id.scalars().one()
+        projects = round(args.pool * args.project_share)
+        if projects:
+            await session.execute(insert(CharityProject), [
+                dict(
+                    name=f'pool project {number}',
+                    description='benchmark',
+                    full_amount=full_amount
+                ) for number, full_amount in enumerate(get_amounts(
+                    rng, args.distribution, args.project_amount, projects
+                ))
+            ])
+        if args.pool - projects:
+            await session.execute(insert(Donation), [
+                dict(user_id=user_id, full_amount=full_amount)
+                for full_amount in get_amounts(
+                    rng, args.distribution, args.donation_amount,
+                    args.pool - projects
+                )
+            ])
+        await session.commit()
+    await dispose_engines()
+    return User(
+        id=user_id, is_active=True, is_verified=True, is_superuser=True
+    )
+
+
+def drive(args: argparse.Namespace, rng: random.Random, user) -> dict:
+    """Отправка потока запросов и подсчет метрик."""
+    from fastapi.testclient import TestClient
+
+    from app.core.config import settings
+    from app.core.user import current_superuser, current_user
+    from app.main import app
+
+    app.dependency_overrides[current_user] = lambda: user
+    app.dependency_overrides[current_superuser] = lambda: user
+    count = args.warmup + args.requests
+    project_amounts = iter(get_amounts(
+        rng, args.distribution, args.project_amount, count
+    ))
+    donation_amounts = iter(get_amounts(
+        rng, args.distribution, args.donation_amount, count
+    ))
+    latencies = []
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        for number in range(count):
+            if number == args.warmup:
+                latencies.clear()
+                started = time.perf_counter()
+            if rng.random() < args.project_share:
+                path, json_body = '/charity_project/', dict(
+                    name=f'project {number}',
+                    description='benchmark',
+                    full_amount=next(project_amounts)
+                )
+            else:
+                path, json_body = '/donation/', dict(
+                    full_amount=next(donation_amounts)
+                )
+            request_started = time.perf_counter()
+            response = client.post(path, json=json_body)
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f'{path} вернул {response.status_code}: {response.text}'
+                )
+        elapsed = time.perf_counter() - started
+    app.dependency_overrides = {}
+    percentiles = quantiles(latencies, n=100, method='inclusive')
+    return dict(
+        requests=args.requests,
+        throughput=round(args.requests / elapsed, 2),
+        p50_ms=round(percentiles[49] * 1000, 3),
+        p95_ms=round(percentiles[94] * 1000, 3),
+        p99_ms=round(percentiles[98] * 1000, 3),
+        settings={key: getattr(settings, key) for key in SETTINGS_KEYS},
+    )
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Список регрессий относительно базового замера."""
+    regressions = []
+    if result['throughput'] < baseline['throughput'] * (1 - tolerance):
+        regressions.append(
+            f'throughput: {result["throughput"]} < {baseline["throughput"]}'
+        )
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f'{key}: {result[key]} > {baseline[key]}')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный тест распределения средств.'
+    )
+    parser.add_argument(
+        '--url', default=DEFAULT_URL,
+        help='Адрес БД для замера, БД пересоздается.'
+    )
+    parser.add_argument(
+        '--pool', type=int, default=1000,
+        help='Количество открытых объектов перед замером.'
+    )
+    parser.add_argument(
+        '--requests', type=int, default=500,
+        help='Количество запросов в замере.'
+    )
+    parser.add_argument(
+        '--warmup', type=int, default=20,
+        help='Количество запросов прогрева, не входящих в замер.'
+    )
+    parser.add_argument(
+        '--project-share', type=float, default=0.1,
+        help='Доля проектов в пуле и в потоке запросов.'
+    )
+    parser.add_argument(
+        '--distribution', choices=('uniform', 'lognormal', 'pareto'),
+        default='lognormal', help='Распределение сумм.'
+    )
+    parser.add_argument(
+        '--project-amount', type=int, default=10000,
+        help='Средняя требуемая сумма проекта.'
+    )
+    parser.add_argument(
+        '--donation-amount', type=int, default=1000,
+        help='Средняя сумма пожертвования.'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--baseline', default='default',
+        help='Имя базового замера в каталоге benchmarks/baselines.'
+    )
+    parser.add_argument(
+        '--save', action='store_true',
+        help='Сохранить результат как базовый замер.'
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='Допустимое ухудшение относительно базового замера.'
+    )
+    args = parser.parse_args()
+    # Настройки читаются при импорте приложения, поэтому модули app
+    # импортируются только после подстановки адреса БД.
+    os.environ['DATABASE_URL'] = args.url
+    rng = random.Random(args.seed)
+    user = asyncio.run(prepare(args, rng))
+    result = drive(args, rng, user)
+    result['parameters'] = {
+        key: value for key, value in vars(args).items()
+        if key not in ('url', 'baseline', 'save', 'tolerance')
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    baseline_path = BASELINES_DIR / f'{args.baseline}.json'
+    if args.save:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        baseline_path.write_text(
+            json.dumps(result, indent=2, ensure_ascii=False) + '\n'
+        )
+        print(f'Базовый замер сохранен в {baseline_path}')
+        return 0
+    if not baseline_path.exists():
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    if (
+        baseline['settings'] != result['settings'] or
+        baseline['parameters'] != result['parameters']
+    ):
+        print('Параметры базового замера отличаются, сравнение пропущено.')
+        return 0
+    regressions = compare(result, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'Регрессия {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
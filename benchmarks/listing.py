@@ -0,0 +1,131 @@
+"""
+Замер стоимости выдачи списка проектов в пересчете на строку.
+
+Сравниваются два способа: ORM-объекты с проверкой схемой ответа
+через FastAPI (serialize_response + JSONResponse) и чтение только нужных
+столбцов с сериализацией RowSerializer.
+
+Запуск:
+    python -m benchmarks.listing --rows 10000 --repeat 5
+
+Указанная БД пересоздается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from statistics import median
+
+DEFAULT_URL = 'sqlite+aiosqlite:///./benchmark.db'
+
+
+async def prepare(rows: int) -> None:
+    """Пересоздание схемы и создание проектов."""
+    from sqlalchemy import insert
+
+    from app.core.db import AsyncSessionLocal, Base, engine
+    from app.models import CharityProject
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(CharityProject), [
+            dict(
+                name=f'project {number}',
+                description='benchmark',
+                full_amount=1000,
+                invested_amount=number % 1000
+            ) for number in range(rows)
+        ])
+        await session.commit()
+
+
+async def orm_path() -> bytes:
+    """Текущий путь: ORM-объекты и схема ответа эндпоинта."""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from app.core.db import AsyncSessionLocal
+    from app.crud import charity_project_crud
+    from app.schemas.charity_project import CharityProjectDB
+
+    async with AsyncSessionLocal() as session:
+        db_objs = await charity_project_crud.get_multi(session)
+        content = await serialize_response(
+            field=create_response_field(
+                name='response', type_=list[CharityProjectDB]
+            ),
+            response_content=db_objs,
+            exclude_none=True
+        )
+    return JSONResponse(content).body
+
+
+async def rows_path() -> bytes:
+    """Быстрый путь: столбцы схемы без ORM-объектов."""
+    from app.api.endpoints.charity_project import project_serializer
+    from app.core.db import AsyncSessionLocal
+    from app.crud import charity_project_crud
+
+    async with AsyncSessionLocal() as session:
+        rows = await charity_project_crud.get_rows(
+            project_serializer.columns, session
+        )
+    return project_serializer.render(rows)
+
+
+async def measure(args: argparse.Namespace) -> dict:
+    """Время выдачи списка каждым способом в микросекундах на строку."""
+    from app.core.db import dispose_engines
+
+    await prepare(args.rows)
+    result = dict(rows=args.rows, repeat=args.repeat)
+    bodies = {}
+    for name, path in (('orm', orm_path), ('rows', rows_path)):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            bodies[name] = await path()
+            timings.append(time.perf_counter() - started)
+        result[f'{name}_us_per_row'] = round(
+            median(timings) / args.rows * 1e6, 3
+        )
+    await dispose_engines()
+    if json.loads(bodies['orm']) != json.loads(bodies['rows']):
+        raise RuntimeError('Результаты способов выдачи различаются.')
+    result['speedup'] = round(
+        result['orm_us_per_row'] / result['rows_us_per_row'], 2
+    )
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Замер стоимости выдачи списка проектов.'
+    )
+    parser.add_argument(
+        '--url', default=DEFAULT_URL,
+        help='Адрес БД для замера, БД пересоздается.'
+    )
+    parser.add_argument(
+        '--rows', type=int, default=10000,
+        help='Количество проектов в списке.'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='Количество повторов каждого способа.'
+    )
+    args = parser.parse_args()
+    # Настройки читаются при импорте приложения, поэтому модули app
+    # импортируются только после подстановки адреса БД.
+    os.environ['DATABASE_URL'] = args.url
+    print(json.dumps(asyncio.run(measure(args)), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
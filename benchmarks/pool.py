@@ -0,0 +1,193 @@
+"""
+Нагрузочный тест пула соединений.
+
+Создает БД с проектами и для каждого варианта пула отправляет
+конкурентные запросы GET /charity_project/?limit=N напрямую
+в ASGI-приложение, выводя пропускную способность и перцентили задержки.
+Варианты пула задаются как null, static или queue:<pool_size>.
+
+Запуск:
+    python -m benchmarks.pool --concurrency 50 --pools null queue:1 queue:10
+    python -m benchmarks.pool --url postgresql+asyncpg://... --pools \\
+        queue:1 queue:5 queue:20
+
+Указанная БД пересоздается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from statistics import quantiles
+
+DEFAULT_URL = 'sqlite+aiosqlite:///./benchmark.db'
+
+
+async def prepare(projects: int) -> None:
+    """Пересоздание схемы и создание проектов."""
+    from sqlalchemy import insert
+
+    from app.core.db import (AsyncSessionLocal, Base, dispose_engines,
+                             engine)
+    from app.models import CharityProject
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(CharityProject), [
+            dict(
+                name=f'project {number}',
+                description='benchmark',
+                full_amount=1000
+            ) for number in range(projects)
+        ])
+        await session.commit()
+    await dispose_engines()
+
+
+async def request(
+    app,
+    path: str,
+    query: str = '',
+    method: str = 'GET',
+    body: bytes = b''
+) -> int:
+    """Запрос к ASGI-приложению, возвращает статус-код."""
+    status = None
+    headers = [(b'host', b'benchmark')]
+    if body:
+        headers.append((b'content-type', b'application/json'))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('benchmark', 80),
+    }
+
+    async def receive() -> dict:
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+async def drive(args: argparse.Namespace, pool: str) -> dict:
+    """Замер для одного варианта пула."""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+    from app.core.db import (get_async_session, get_engine_options,
+                             get_read_session)
+    from app.main import app
+
+    pool_class, _, pool_size = pool.partition(':')
+    settings.pool_class = pool_class
+    if pool_size:
+        settings.pool_size = int(pool_size)
+        settings.pool_max_overflow = 0
+    engine = create_async_engine(args.url, **get_engine_options(args.url))
+    session_factory = sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def override_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    query = f'limit={args.limit}'
+    latencies = []
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            started = time.perf_counter()
+            status = await request(app, '/charity_project/', query)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                raise RuntimeError(f'Запрос вернул статус-код {status}.')
+
+    per_worker = args.requests // args.concurrency
+    await asyncio.gather(*(worker(2) for _ in range(args.concurrency)))
+    latencies.clear()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(worker(per_worker) for _ in range(args.concurrency))
+    )
+    elapsed = time.perf_counter() - started
+    app.dependency_overrides = {}
+    await engine.dispose()
+    percentiles = quantiles(latencies, n=100, method='inclusive')
+    return dict(
+        pool=pool,
+        requests=len(latencies),
+        throughput=round(len(latencies) / elapsed, 2),
+        p50_ms=round(percentiles[49] * 1000, 3),
+        p95_ms=round(percentiles[94] * 1000, 3),
+        p99_ms=round(percentiles[98] * 1000, 3),
+    )
+
+
+async def measure(args: argparse.Namespace) -> dict:
+    """Замеры для всех вариантов пула."""
+    await prepare(args.projects)
+    return dict(
+        concurrency=args.concurrency,
+        results=[await drive(args, pool) for pool in args.pools],
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный тест пула соединений.'
+    )
+    parser.add_argument(
+        '--url', default=DEFAULT_URL,
+        help='Адрес БД для замера, БД пересоздается.'
+    )
+    parser.add_argument(
+        '--pools', nargs='+', default=['null', 'queue:1', 'queue:5'],
+        help='Варианты пула: null, static или queue:<pool_size>.'
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=20,
+        help='Количество одновременных клиентов.'
+    )
+    parser.add_argument(
+        '--requests', type=int, default=1000,
+        help='Количество запросов на каждый вариант пула.'
+    )
+    parser.add_argument(
+        '--projects', type=int, default=1000,
+        help='Количество проектов в БД.'
+    )
+    parser.add_argument(
+        '--limit', type=int, default=50,
+        help='Размер запрашиваемой страницы проектов.'
+    )
+    args = parser.parse_args()
+    # Настройки читаются при импорте приложения, поэтому модули app
+    # импортируются только после подстановки адреса БД.
+    os.environ['DATABASE_URL'] = args.url
+    print(json.dumps(asyncio.run(measure(args)), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Замер скорости сериализации ответов со списком проектов.
+
+Сравниваются три способа на одних и тех же ORM-объектах в памяти:
+проверка схемой ответа и стандартный json (JSONResponse), проверка
+схемой и orjson (FastJSONResponse) и сериализация по полям схемы без
+повторной валидации (TrustedORMRoute при VALIDATE_RESPONSES=false).
+
+Запуск:
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from statistics import median
+
+
+def make_projects(count: int) -> list:
+    """ORM-объекты проектов без сохранения в БД."""
+    from app.models import CharityProject
+
+    create_date = datetime(2020, 1, 1, 12, 30, 15, 123456)
+    return [
+        CharityProject(
+            id=number,
+            name=f'project {number}',
+            description=' '.join(['benchmark'] * 5),
+            full_amount=1000,
+            invested_amount=number % 1000,
+            fully_invested=False,
+            create_date=create_date + timedelta(seconds=number),
+            close_date=None,
+            allocation_pending=False
+        ) for number in range(1, count + 1)
+    ]
+
+
+async def validated(projects: list, response_class) -> bytes:
+    """Проверка схемой ответа, как у FastAPI по умолчанию."""
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from app.schemas.charity_project import CharityProjectDB
+
+    content = await serialize_response(
+        field=create_response_field(
+            name='response', type_=list[CharityProjectDB]
+        ),
+        response_content=projects,
+        exclude_none=True
+    )
+    return response_class(content).body
+
+
+async def trusted(projects: list, serializer) -> bytes:
+    """Сериализация по полям схемы без валидации."""
+    return serializer.render(projects)
+
+
+async def measure(args: argparse.Namespace) -> dict:
+    """Скорость каждого способа в строках в секунду."""
+    from fastapi.responses import JSONResponse
+
+    from app.api.serialization import FastJSONResponse, SchemaSerializer
+    from app.schemas.charity_project import CharityProjectDB
+
+    projects = make_projects(args.rows)
+    paths = {
+        'validated_json': (validated, JSONResponse),
+        'validated_orjson': (validated, FastJSONResponse),
+        'trusted_orjson': (
+            trusted,
+            SchemaSerializer(schema=CharityProjectDB, exclude_none=True)
+        ),
+    }
+    result = dict(rows=args.rows, repeat=args.repeat)
+    bodies = {}
+    for name, (path, argument) in paths.items():
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            bodies[name] = await path(projects, argument)
+            timings.append(time.perf_counter() - started)
+        result[f'{name}_rows_per_second'] = round(
+            args.rows / median(timings)
+        )
+    if len({body for body in bodies.values()}) != 1:
+        raise RuntimeError('Результаты способов сериализации различаются.')
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Замер скорости сериализации ответов.'
+    )
+    parser.add_argument(
+        '--rows', type=int, default=10000,
+        help='Количество проектов в списке.'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='Количество повторов каждого способа.'
+    )
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(measure(args)), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Нагрузочный тест профиля SQLite.
+
+Для каждого профиля пересоздает БД с проектами, запускает конкурентных
+читателей GET /charity_project/?limit=N и одновременно отправляет
+пачки запросов POST /donation/. Выводит пропускную способность и
+перцентили задержки чтения во время пачек записи, а также количество
+записей и ошибок записи.
+
+Профили:
+    rollback   — журнал отката, synchronous=FULL, без писателя;
+    wal        — WAL, synchronous=NORMAL, без писателя;
+    wal-writer — WAL, synchronous=NORMAL, пишущие транзакции через
+                 единственное соединение писателя.
+
+Запуск:
+    python -m benchmarks.sqlite_profile --readers 10 --bursts 10 \\
+        --burst-size 10
+
+Указанная БД пересоздается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from statistics import quantiles
+
+from benchmarks.pool import request
+
+DEFAULT_URL = 'sqlite+aiosqlite:///./benchmark.db'
+PROFILES = {
+    'rollback': dict(
+        sqlite_journal_mode='DELETE',
+        sqlite_synchronous='FULL',
+        sqlite_writer=False,
+    ),
+    'wal': dict(
+        sqlite_journal_mode='WAL',
+        sqlite_synchronous='NORMAL',
+        sqlite_writer=False,
+    ),
+    'wal-writer': dict(
+        sqlite_journal_mode='WAL',
+        sqlite_synchronous='NORMAL',
+        sqlite_writer=True,
+    ),
+}
+
+
+async def prepare(args: argparse.Namespace, engine, session_factory):
+    """Пересоздание схемы, создание пользователя и проектов."""
+    from sqlalchemy import insert, select
+
+    from app.core.db import Base
+    from app.models import CharityProject, User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as session:
+        await session.execute(insert(User), [dict(
+            email='benchmark@example.com',
+            hashed_password='benchmark',
+            is_active=True,
+            is_superuser=False,
+            is_verified=True
+        )])
+        await session.execute(insert(CharityProject), [
+            dict(
+                name=f'project {number}',
+                description='benchmark',
+                full_amount=10 ** 9
+            ) for number in range(args.projects)
+        ])
+        await session.commit()
+        user_id = await session.execute(select(User.id))
+    return User(id=user_id.scalars().one(), is_active=True, is_verified=True)
+
+
+def percentiles_ms(latencies: list[float]) -> dict:
+    """Перцентили задержки в миллисекундах."""
+    percentiles = quantiles(latencies, n=100, method='inclusive')
+    return dict(
+        p50_ms=round(percentiles[49] * 1000, 3),
+        p95_ms=round(percentiles[94] * 1000, 3),
+        p99_ms=round(percentiles[98] * 1000, 3),
+    )
+
+
+async def run_load(args: argparse.Namespace, app) -> tuple:
+    """
+    Чтение во время пачек записи.
+
+    Возвращает задержки чтений, количество записей, количество ошибок
+    записи и длительность замера.
+    """
+    query = f'limit={args.limit}'
+    body = json.dumps(dict(full_amount=100)).encode()
+    read_latencies = []
+    writes = errors = 0
+    done = asyncio.Event()
+
+    async def read() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            status = await request(app, '/charity_project/', query)
+            read_latencies.append(time.perf_counter() - started)
+            if status != 200:
+                raise RuntimeError(f'Чтение вернуло статус-код {status}.')
+
+    async def write() -> None:
+        nonlocal writes, errors
+        try:
+            status = await request(
+                app, '/donation/', method='POST', body=body
+            )
+        except Exception:
+            status = None
+        if status == 200:
+            writes += 1
+        else:
+            errors += 1
+
+    async def write_bursts() -> None:
+        for _ in range(args.bursts):
+            await asyncio.gather(
+                *(write() for _ in range(args.burst_size))
+            )
+            await asyncio.sleep(args.pause)
+        done.set()
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        write_bursts(), *(read() for _ in range(args.readers))
+    )
+    return read_latencies, writes, errors, time.perf_counter() - started
+
+
+async def drive(args: argparse.Namespace, profile: str) -> dict:
+    """Замер для одного профиля."""
+    from fastapi import Request
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+    from app.core.db import (READ_METHODS, create_engine, get_async_session,
+                             get_read_session)
+    from app.core.user import current_user
+    from app.main import app
+
+    for key, value in PROFILES[profile].items():
+        setattr(settings, key, value)
+    reader = create_engine(args.url)
+    writer = (
+        create_engine(args.url, writer=True)
+        if settings.sqlite_writer else reader
+    )
+    read_factory, write_factory = (
+        sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        for engine in (reader, writer)
+    )
+    user = await prepare(args, writer, write_factory)
+
+    async def override_session(request: Request):
+        session_factory = write_factory
+        if request.method in READ_METHODS:
+            session_factory = read_factory
+        async with session_factory() as session:
+            yield session
+
+    async def override_read_session():
+        async with read_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[get_read_session] = override_read_session
+    app.dependency_overrides[current_user] = lambda: user
+    read_latencies, writes, errors, elapsed = await run_load(args, app)
+    app.dependency_overrides = {}
+    await reader.dispose()
+    if writer is not reader:
+        await writer.dispose()
+    return dict(
+        profile=profile,
+        elapsed_s=round(elapsed, 3),
+        reads=len(read_latencies),
+        read_throughput=round(len(read_latencies) / elapsed, 2),
+        **percentiles_ms(read_latencies),
+        writes=writes,
+        write_errors=errors,
+        write_throughput=round(writes / elapsed, 2),
+    )
+
+
+async def measure(args: argparse.Namespace) -> dict:
+    """Замеры для всех профилей."""
+    return dict(
+        readers=args.readers,
+        bursts=args.bursts,
+        burst_size=args.burst_size,
+        results=[await drive(args, profile) for profile in args.profiles],
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный тест профиля SQLite.'
+    )
+    parser.add_argument(
+        '--url', default=DEFAULT_URL,
+        help='Адрес файловой БД SQLite для замера, БД пересоздается.'
+    )
+    parser.add_argument(
+        '--profiles', nargs='+', choices=tuple(PROFILES),
+        default=list(PROFILES), help='Сравниваемые профили.'
+    )
+    parser.add_argument(
+        '--readers', type=int, default=10,
+        help='Количество одновременных читателей, не меньше одного.'
+    )
+    parser.add_argument(
+        '--bursts', type=int, default=10,
+        help='Количество пачек записи.'
+    )
+    parser.add_argument(
+        '--burst-size', type=int, default=10,
+        help='Количество одновременных запросов записи в пачке.'
+    )
+    parser.add_argument(
+        '--pause', type=float, default=0.05,
+        help='Пауза между пачками записи в секундах.'
+    )
+    parser.add_argument(
+        '--projects', type=int, default=1000,
+        help='Количество проектов в БД.'
+    )
+    parser.add_argument(
+        '--limit', type=int, default=50,
+        help='Размер запрашиваемой страницы проектов.'
+    )
+    args = parser.parse_args()
+    # Настройки читаются при импорте приложения, поэтому модули app
+    # импортируются только после подстановки адреса БД.
+    os.environ['DATABASE_URL'] = args.url
+    print(json.dumps(asyncio.run(measure(args)), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
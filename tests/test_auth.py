@@ -1,3 +1,12 @@
+from conftest import TestingSessionLocal, app, current_user, engine
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event, update
+
+from app.core.user import UserManager, user_cache
+from app.models import User
+from app.schemas.user import UserCreate, UserUpdate
+
+
 
 
 def test_register(test_client):
@@ -45,3 +54,90 @@ def test_register_invalid_pass(user_client):
         'При некорректной регистрации пользователя тело ответа API отличается '
         'от ожидаемого.'
     )
+
+
+def test_current_user_cache(test_client):
+    app.dependency_overrides.pop(current_user)
+    test_client.post('/auth/register', json={
+        'email': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    })
+    token = test_client.post('/auth/jwt/login', data={
+        'username': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    }).json()['access_token']
+    user_cache.clear()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    headers = {'Authorization': f'Bearer {token}'}
+    assert test_client.get('/donation/my', headers=headers).status_code == 200
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = test_client.get('/donation/my', headers=headers)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200
+    assert (user_cache.hits, user_cache.misses) == (1, 1), (
+        'Повторный запрос пользователя должен обслуживаться из кеша.'
+    )
+    assert not [
+        statement for statement in statements if 'FROM "user"' in statement
+    ], 'Пользователь из кеша не должен загружаться из БД.'
+
+
+def test_superuser_updates_self_with_cold_cache(test_client):
+    app.dependency_overrides.pop(current_user)
+    test_client.post('/auth/register', json={
+        'email': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    })
+
+    async def make_superuser():
+        async with TestingSessionLocal() as session:
+            await session.execute(update(User).values(is_superuser=True))
+            await session.commit()
+
+    test_client.portal.call(make_superuser)
+    token = test_client.post('/auth/jwt/login', data={
+        'username': 'dead@pool.com',
+        'password': 'chimichangas4life',
+    }).json()['access_token']
+    user_cache.clear()
+    response = test_client.patch(
+        '/users/1',
+        json={'email': 'wade@pool.com'},
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 200, (
+        'Суперпользователь должен иметь возможность изменить себя, '
+        'когда пользователь из кеша уже загружен в сессию запроса.'
+    )
+    assert response.json()['email'] == 'wade@pool.com', (
+        'Изменение пользователя должно сохраняться в БД.'
+    )
+
+
+async def test_user_cache_invalidated_on_update():
+    user_cache.clear()
+    async with TestingSessionLocal() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        user = await manager.create(UserCreate(
+            email='dead@pool.com', password='chimichangas4life'
+        ))
+        await manager.get(user.id)
+        cached = await manager.get(user.id)
+    async with TestingSessionLocal() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        await manager.update(UserUpdate(is_active=False), cached)
+        user = await manager.get(user.id)
+        await manager.get(user.id)
+    assert not user.is_active, (
+        'Изменение пользователя из кеша должно сохраняться в БД.'
+    )
+    assert (user_cache.hits, user_cache.misses) == (1, 3), (
+        'Изменение пользователя должно удалять его из кеша, '
+        'неактивные пользователи не должны кешироваться.'
+    )
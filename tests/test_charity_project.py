@@ -1,6 +1,15 @@
+import json
 from datetime import datetime
 
 import pytest
+from conftest import app, engine, get_read_session
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.dialects.postgresql.base import PGCompiler
+from sqlalchemy.dialects.sqlite.base import SQLiteCompiler
+
+from app.core import db
+from app.core.config import settings
+from app.models import CharityProject
 
 
 @pytest.mark.parametrize(
@@ -696,3 +705,314 @@ def test_get_all_charity_project_not_auth_user(test_client, charity_project,
             'name': 'nunchaku'
         }
     ]
+
+
+def test_get_charity_project_investments(superuser_client, donation,
+                                         another_donation):
+    superuser_client.post('/charity_project/', json={
+        'name': 'chimichangas4life',
+        'description': 'Huge fan of chimichangas. Wanna buy a lot',
+        'full_amount': 1500,
+    })
+    response = superuser_client.get('/charity_project/1/investments')
+    assert response.status_code == 200, (
+        'При получении списка вложений в проект должен возвращаться '
+        'статус-код 200.'
+    )
+    assert [
+        (investment['donation_id'], investment['amount'])
+        for investment in response.json()
+    ] == [(1, 100), (2, 1400)], (
+        'Список вложений в проект должен перечислять пожертвования '
+        'и вложенные суммы.'
+    )
+
+
+def test_get_charity_project_investments_usual_user(user_client,
+                                                    charity_project):
+    response = user_client.get('/charity_project/1/investments')
+    assert response.status_code == 401, (
+        'Список вложений в проект должен быть доступен только '
+        'суперпользователю.'
+    )
+
+
+def test_import_charity_projects_csv(superuser_client, charity_project,
+                                     donation):
+    content = (
+        'name,description,full_amount\n'
+        'first,First project,60\n'
+        'second,Second project,-5\n'
+        'first,Duplicate in file,10\n'
+        'chimichangas4life,Existing project,10\n'
+        'third,Third project,60\n'
+    )
+    response = superuser_client.post(
+        '/charity_project/import',
+        files={'file': ('projects.csv', content, 'text/csv')}
+    )
+    assert response.status_code == 200, (
+        'При импорте проектов должен возвращаться статус-код 200.'
+    )
+    data = response.json()
+    assert data['created'] == 2, (
+        'Импорт должен создавать проекты из корректных строк.'
+    )
+    assert [error['line'] for error in data['errors']] == [3, 4, 5], (
+        'Импорт должен сообщать о строках с ошибками, не прерываясь.'
+    )
+    projects = {
+        project['name']: project
+        for project in superuser_client.get('/charity_project/').json()
+    }
+    assert (
+        projects['first']['invested_amount'],
+        projects['third']['invested_amount'],
+    ) == (60, 40), (
+        'После импорта открытые пожертвования должны распределяться '
+        'по новым проектам.'
+    )
+
+
+def test_import_charity_projects_jsonl(superuser_client):
+    content = (
+        '{"name": "first", "description": "First project", '
+        '"full_amount": 10}\n'
+        '\n'
+        'not json\n'
+        '{"name": "second", "description": "Second project", '
+        '"full_amount": 20, "invested_amount": 5}\n'
+    )
+    response = superuser_client.post(
+        '/charity_project/import',
+        files={'file': ('projects.jsonl', content, 'application/x-ndjson')}
+    )
+    assert response.status_code == 200, (
+        'При импорте проектов должен возвращаться статус-код 200.'
+    )
+    data = response.json()
+    assert (data['created'], [error['line'] for error in data['errors']]) == (
+        1, [3, 4]
+    ), 'Импорт должен сообщать о строках с ошибками, не прерываясь.'
+
+
+def test_import_charity_projects_invalid_format(superuser_client):
+    response = superuser_client.post(
+        '/charity_project/import',
+        files={'file': ('projects.xlsx', b'', 'application/octet-stream')}
+    )
+    assert response.status_code == 422, (
+        'При импорте файла неподдерживаемого формата должен возвращаться '
+        'статус-код 422.'
+    )
+
+
+def test_get_charity_projects_page(user_client, charity_project,
+                                   charity_project_nunchaku,
+                                   small_fully_charity_project):
+    response = user_client.get('/charity_project/', params={'limit': 2})
+    assert response.status_code == 200, (
+        'При получении страницы проектов должен возвращаться статус-код 200.'
+    )
+    first_page = response.json()
+    assert [project['id'] for project in first_page['items']] == [1, 2], (
+        'Страница должна содержать проекты в порядке создания.'
+    )
+    response = user_client.get('/charity_project/', params={
+        'limit': 2, 'after': first_page['next_cursor']
+    })
+    second_page = response.json()
+    assert [project['id'] for project in second_page['items']] == [3], (
+        'Следующая страница должна начинаться после курсора.'
+    )
+    assert second_page['next_cursor'] is None, (
+        'У последней страницы курсор следующей страницы должен быть null.'
+    )
+    assert all(
+        'close_date' not in project for project in first_page['items']
+    ), 'Пустые поля проектов страницы не должны выдаваться.'
+
+
+def test_get_charity_projects_page_invalid_cursor(user_client):
+    response = user_client.get(
+        '/charity_project/', params={'after': 'not a cursor'}
+    )
+    assert response.status_code == 422, (
+        'При некорректном курсоре должен возвращаться статус-код 422.'
+    )
+
+
+def test_get_charity_projects_ndjson(user_client, charity_project,
+                                     charity_project_nunchaku):
+    response = user_client.get(
+        '/charity_project/', headers={'Accept': 'application/x-ndjson'}
+    )
+    assert response.status_code == 200, (
+        'При потоковой выдаче проектов должен возвращаться статус-код 200.'
+    )
+    assert response.headers['content-type'].startswith(
+        'application/x-ndjson'
+    ), 'Потоковая выдача должна иметь тип application/x-ndjson.'
+    projects = [json.loads(line) for line in response.text.splitlines()]
+    assert projects == user_client.get('/charity_project/').json(), (
+        'Потоковая выдача должна содержать по проекту в строке '
+        'в том же виде, что и обычный список.'
+    )
+
+
+def test_get_charity_projects_matches_page(user_client, charity_project,
+                                           small_fully_charity_project):
+    projects = user_client.get('/charity_project/').json()
+    page = user_client.get('/charity_project/', params={'limit': 10}).json()
+    assert projects == page['items'], (
+        'Полный список, читаемый без ORM-объектов, должен совпадать '
+        'с элементами страницы списка.'
+    )
+
+
+def test_get_charity_projects_not_modified(user_client, charity_project):
+    response = user_client.get('/charity_project/')
+    etag = response.headers.get('etag')
+    assert etag, 'Полный список проектов должен отдаваться с заголовком ETag.'
+    response = user_client.get(
+        '/charity_project/', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 304, (
+        'При совпадении If-None-Match должен возвращаться статус-код 304.'
+    )
+    assert response.content == b'', 'Ответ 304 не должен содержать тела.'
+
+
+@pytest.mark.parametrize('investment_engine', ['python', 'sql'])
+def test_get_charity_projects_etag_changes(monkeypatch, user_client,
+                                           charity_project,
+                                           investment_engine):
+    monkeypatch.setattr(settings, 'investment_engine', investment_engine)
+    etag = user_client.get('/charity_project/').headers['etag']
+    user_client.post('/donation/', json={'full_amount': 100})
+    response = user_client.get(
+        '/charity_project/', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200, (
+        'После распределения средств список проектов должен '
+        'отдаваться заново.'
+    )
+    assert response.headers['etag'] != etag, (
+        'Распределение средств должно менять ETag списка проектов.'
+    )
+    assert response.json()[0]['invested_amount'] == 100, (
+        'Список проектов не должен браться из устаревшего кеша.'
+    )
+
+
+def capture_statements(client, method, url, json):
+    """Запросы к БД, выполненные при обработке запроса к API."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 2)[:2])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        response = client.request(method, url, json=json)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+    return response, statements
+
+
+def test_update_charity_project_single_update(superuser_client,
+                                              charity_project):
+    response, statements = capture_statements(
+        superuser_client, 'PATCH', '/charity_project/1',
+        {'name': 'renamed', 'full_amount': 500},
+    )
+    assert response.status_code == 200
+    assert response.json()['name'] == 'renamed'
+    assert statements[0] == ['UPDATE', 'charityproject'], (
+        'Изменение проекта должно начинаться с условного UPDATE без '
+        'предварительных проверок отдельными запросами.'
+    )
+
+
+def test_create_charity_project_no_name_check(superuser_client):
+    response, statements = capture_statements(
+        superuser_client, 'POST', '/charity_project/',
+        {'name': 'new', 'description': 'new', 'full_amount': 10},
+    )
+    assert response.status_code == 200
+    assert ['SELECT', 'charityproject.id'] not in statements, (
+        'Уникальность названия проекта должна проверяться ограничением '
+        'БД, а не отдельным запросом.'
+    )
+
+
+def test_update_charity_project_returning_changes_etag(monkeypatch,
+                                                       superuser_client,
+                                                       charity_project):
+    # SQLite 3.35+ выполняет RETURNING, но компилятор SQLAlchemy 1.4 его
+    # не формирует: для проверки ветки PostgreSQL подставляется
+    # компиляция RETURNING из диалекта PostgreSQL.
+    monkeypatch.setattr(
+        SQLiteCompiler, 'returning_clause', PGCompiler.returning_clause,
+        raising=False
+    )
+    monkeypatch.setattr(engine.dialect, 'full_returning', True)
+    etag = superuser_client.get('/charity_project/').headers['etag']
+    response, statements = capture_statements(
+        superuser_client, 'PATCH', '/charity_project/1', {'name': 'renamed'}
+    )
+    assert response.status_code == 200
+    assert ['SELECT', 'charityproject.id'] not in statements, (
+        'При поддержке RETURNING измененный проект должен возвращаться '
+        'тем же запросом UPDATE.'
+    )
+    response = superuser_client.get('/charity_project/')
+    assert response.headers['etag'] != etag, (
+        'Изменение проекта запросом UPDATE ... RETURNING должно менять '
+        'ETag списка проектов.'
+    )
+    assert response.json()[0]['name'] == 'renamed'
+
+
+@pytest.mark.parametrize('validate_responses', [True, False])
+def test_update_charity_project_trusted_response(monkeypatch,
+                                                 superuser_client,
+                                                 charity_project,
+                                                 validate_responses):
+    monkeypatch.setattr(settings, 'validate_responses', validate_responses)
+    response = superuser_client.patch(
+        '/charity_project/1', json={'description': 'new description'}
+    )
+    assert response.json() == {
+        'name': 'chimichangas4life',
+        'description': 'new description',
+        'full_amount': 1000000,
+        'id': 1,
+        'invested_amount': 0,
+        'fully_invested': False,
+        'close_date': None,
+        'create_date': '2010-10-10T00:00:00',
+    }, (
+        'Ответ без повторной валидации схемой должен совпадать '
+        'с проверенным ответом.'
+    )
+
+
+def test_get_charity_projects_from_replica(monkeypatch, tmp_path,
+                                           user_client, charity_project):
+    replica_path = tmp_path / 'replica.db'
+    replica = create_engine(f'sqlite:///{replica_path}')
+    db.Base.metadata.create_all(replica)
+    with replica.begin() as conn:
+        conn.execute(insert(CharityProject), [
+            dict(name='replica', description='replica', full_amount=10)
+        ])
+    replica.dispose()
+    monkeypatch.setattr(db, 'replica_router', db.ReplicaRouter(
+        db.create_engine(f'sqlite+aiosqlite:///{replica_path}')
+    ))
+    monkeypatch.delitem(app.dependency_overrides, get_read_session)
+    response = user_client.get('/charity_project/')
+    assert [project['name'] for project in response.json()] == [
+        'replica'
+    ], 'Список проектов должен читаться с настроенной реплики.'
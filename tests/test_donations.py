@@ -1,7 +1,10 @@
+import json
 from datetime import datetime
 
 import pytest
 
+from app.core.config import settings
+
 
 @pytest.mark.parametrize('json, keys, expected_data', [
     (
@@ -197,3 +200,192 @@ def test_create_donation_check_create_date(user_client):
         'При создании двух пожертвований с паузой (в 1 секунду, например) у '
         'них должны быть разные `create_date`'
     )
+
+
+def test_create_donation_batch(user_client, charity_project):
+    response = user_client.post('/donation/batch', json=[
+        {'full_amount': 400000},
+        {'full_amount': 700000, 'comment': 'To you for chimichangas'},
+    ])
+    assert response.status_code == 200, (
+        'При создании пачки пожертвований должен возвращаться статус-код 200.'
+    )
+    data = response.json()
+    for donation in data:
+        donation.pop('create_date')
+    assert data == [
+        {'full_amount': 400000, 'id': 1},
+        {'full_amount': 700000, 'id': 2, 'comment': 'To you for chimichangas'},
+    ], (
+        'При создании пачки пожертвований тело ответа API отличается '
+        'от ожидаемого.'
+    )
+    assert charity_project.fully_invested, (
+        'Пачка пожертвований должна распределяться по открытым проектам.'
+    )
+    assert charity_project.invested_amount == 1000000, (
+        'Пачка пожертвований должна распределяться по открытым проектам.'
+    )
+
+
+def test_create_donation_batch_too_large(user_client):
+    response = user_client.post('/donation/batch', json=[
+        {'full_amount': 10}
+    ] * (settings.max_donation_batch_size + 1))
+    assert response.status_code == 422, (
+        'При превышении размера пачки пожертвований должен возвращаться '
+        'статус-код 422.'
+    )
+    assert user_client.get('/donation/my').json() == [], (
+        'Пожертвования из слишком большой пачки не должны сохраняться.'
+    )
+
+
+def test_get_donation_investments(user_client, charity_project,
+                                  charity_project_nunchaku):
+    user_client.post('/donation/', json={'full_amount': 1500000})
+    response = user_client.get('/donation/1/investments')
+    assert response.status_code == 200, (
+        'При получении распределения пожертвования должен возвращаться '
+        'статус-код 200.'
+    )
+    data = response.json()
+    for investment in data:
+        investment.pop('create_date')
+    assert data == [
+        {'donation_id': 1, 'project_id': 1, 'amount': 1000000},
+        {'donation_id': 1, 'project_id': 2, 'amount': 500000},
+    ], (
+        'Распределение пожертвования должно перечислять проекты '
+        'и вложенные в них суммы.'
+    )
+
+
+def test_get_donation_investments_other_user(user_client, another_donation):
+    response = user_client.get(f'/donation/{another_donation.id}/investments')
+    assert response.status_code == 404, (
+        'Распределение чужого пожертвования должно быть недоступно '
+        'пользователю.'
+    )
+
+
+def test_get_user_donations_page(user_client):
+    for full_amount in (10, 20, 30):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    first_page = user_client.get('/donation/my', params={'limit': 2}).json()
+    second_page = user_client.get('/donation/my', params={
+        'limit': 2, 'after': first_page['next_cursor']
+    }).json()
+    assert (
+        [donation['full_amount'] for donation in first_page['items']],
+        [donation['full_amount'] for donation in second_page['items']],
+        second_page['next_cursor'],
+    ) == ([10, 20], [30], None), (
+        'Пожертвования пользователя должны выдаваться постранично '
+        'в порядке создания.'
+    )
+    assert isinstance(
+        user_client.get('/donation/my', params={'all': True}).json(), list
+    ), 'С параметром all должен возвращаться полный список.'
+
+
+def test_get_all_donations_last_page(superuser_client, donation,
+                                     another_donation):
+    response = superuser_client.get('/donation/', params={'limit': 2})
+    assert response.status_code == 200, (
+        'При получении страницы пожертвований должен возвращаться '
+        'статус-код 200.'
+    )
+    page = response.json()
+    assert (
+        [item['id'] for item in page['items']], page['next_cursor']
+    ) == ([1, 2], None), (
+        'У последней страницы курсор следующей страницы должен быть null, '
+        'как и в списке пожертвований пользователя.'
+    )
+    assert all('close_date' not in item for item in page['items']), (
+        'Пустые поля пожертвований страницы не должны выдаваться.'
+    )
+
+
+def test_get_user_donations_ndjson(user_client, another_donation):
+    for full_amount in (10, 20):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    response = user_client.get(
+        '/donation/my', headers={'Accept': 'application/x-ndjson'}
+    )
+    donations = [json.loads(line) for line in response.text.splitlines()]
+    assert [donation['full_amount'] for donation in donations] == [10, 20], (
+        'Потоковая выдача должна содержать только пожертвования '
+        'пользователя в порядке создания.'
+    )
+    assert donations == user_client.get('/donation/my').json(), (
+        'Строки потоковой выдачи должны совпадать с элементами '
+        'обычного списка.'
+    )
+
+
+def test_get_all_donations_matches_page(superuser_client, donation,
+                                        another_donation):
+    donations = superuser_client.get('/donation/').json()
+    page = superuser_client.get('/donation/', params={'limit': 10}).json()
+    assert donations == page['items'], (
+        'Полный список, читаемый без ORM-объектов, должен совпадать '
+        'с элементами страницы списка.'
+    )
+
+
+def test_get_user_donations_summary(user_client, another_donation):
+    response = user_client.get('/donation/my/summary')
+    assert response.status_code == 200, (
+        'При получении сводки по пожертвованиям должен возвращаться '
+        'статус-код 200.'
+    )
+    assert response.json() == {
+        'count': 0,
+        'total_donated': 0,
+        'total_invested': 0,
+        'open_amount': 0,
+        'first_donation_date': None,
+        'last_donation_date': None,
+    }, 'Сводка пользователя без пожертвований должна быть нулевой.'
+    for full_amount in (10, 30):
+        user_client.post('/donation/', json={'full_amount': full_amount})
+    donations = user_client.get('/donation/my').json()
+    summary = user_client.get('/donation/my/summary').json()
+    assert (
+        summary['count'],
+        summary['total_donated'],
+        summary['open_amount'],
+        summary['first_donation_date'],
+        summary['last_donation_date'],
+    ) == (
+        2, 40, 40,
+        donations[0]['create_date'],
+        donations[-1]['create_date'],
+    ), 'Сводка должна учитывать только пожертвования пользователя.'
+
+
+def test_get_donations_summary(superuser_client, donation, another_donation):
+    response = superuser_client.get('/donation/summary')
+    assert response.status_code == 200, (
+        'При получении сводок по пожертвованиям должен возвращаться '
+        'статус-код 200.'
+    )
+    donations = superuser_client.get('/donation/').json()
+    assert [
+        (summary['user_id'], summary['count'], summary['total_donated'],
+         summary['total_invested'])
+        for summary in response.json()
+    ] == [
+        (item['user_id'], 1, item['full_amount'], item['invested_amount'])
+        for item in sorted(donations, key=lambda item: item['user_id'])
+    ], 'Сводки должны быть сгруппированы по пользователям.'
+
+
+def test_get_donations_summary_forbidden(user_client):
+    response = user_client.get('/donation/summary')
+    assert response.status_code == 401, (
+        'Сводки по всем пользователям должны быть доступны только '
+        'суперпользователю.'
+    )
@@ -1,3 +1,21 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from conftest import Base, TestingSessionLocal, engine
+from sqlalchemy import delete, event, func, insert, select, update
+
+from app.core.config import settings
+from app.core.custom_types import AllocationState
+from app.crud import charity_project_crud, investment_crud
+from app.models import CharityProject, Donation, Investment
+from app.services.allocation_queue import AllocationQueue
+from app.services.investments import allocate, invest, invest_many
+from app.services.open_pool import OpenPool, open_pool_index
+from app.tools import import_projects
+from app.tools.replay import replay
+
+
 def test_donation_exist_non_project(superuser_client, donation):
     response_donation = superuser_client.get('/donation/')
     data_donation = response_donation.json()
@@ -53,3 +71,601 @@ def test_donation_to_little_invest_project(user_client, charity_project_little_i
     )
     assert not charity_project_nunchaku.fully_invested, common_asser_msg
     assert charity_project_nunchaku.invested_amount == 0, common_asser_msg
+
+
+ALLOCATION_SCENARIO = [
+    ('project', 100),
+    ('donation', 30),
+    ('donation', 50),
+    ('donation', 250),
+    ('project', 50),
+    ('project', 500),
+    ('donation', 120),
+    ('project', 40),
+    ('donation', 600),
+    ('project', 1000),
+    ('donation', 1),
+]
+
+
+async def run_allocation_scenario():
+    async with TestingSessionLocal() as session:
+        for number, (kind, full_amount) in enumerate(ALLOCATION_SCENARIO):
+            if kind == 'project':
+                obj = CharityProject(
+                    name=f'project {number}',
+                    description='description',
+                    full_amount=full_amount,
+                )
+            else:
+                obj = Donation(user_id=1, full_amount=full_amount)
+            session.add(obj)
+            await invest(allocated=obj, session=session)
+            await session.commit()
+        state = {}
+        for model in (CharityProject, Donation):
+            objs = await session.execute(select(model).order_by(model.id))
+            state[model.__name__] = [
+                (
+                    obj.id,
+                    obj.invested_amount,
+                    obj.fully_invested,
+                    obj.close_date is not None,
+                ) for obj in objs.scalars().all()
+            ]
+        return state
+
+
+async def test_sql_engine_parity(monkeypatch):
+    monkeypatch.setattr(settings, 'investment_engine', 'python')
+    expected_state = await run_allocation_scenario()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(settings, 'investment_engine', 'sql')
+    assert await run_allocation_scenario() == expected_state, (
+        'Распределение средств на стороне БД должно давать тот же '
+        'результат, что и эталонная реализация.'
+    )
+
+
+async def test_stream_opened_order(monkeypatch):
+    monkeypatch.setattr(settings, 'opened_chunk_size', 2)
+    async with TestingSessionLocal() as session:
+        for number in range(5):
+            session.add(CharityProject(
+                name=f'project {number}',
+                description='description',
+                full_amount=100,
+                fully_invested=number == 2,
+                create_date=datetime(2020, 1, 10 - number),
+            ))
+        await session.commit()
+        ids = [
+            project.id async for project in
+            charity_project_crud.stream_opened(session)
+        ]
+    assert ids == [5, 4, 2, 1], (
+        'Открытые проекты должны выдаваться в порядке create_date, id.'
+    )
+
+
+@pytest.mark.parametrize('investment_engine', ['python', 'sql'])
+async def test_invest_many_matches_sequential(monkeypatch, investment_engine):
+    monkeypatch.setattr(settings, 'investment_engine', investment_engine)
+    async with TestingSessionLocal() as session:
+        for number, full_amount in enumerate((100, 50, 300)):
+            session.add(CharityProject(
+                name=f'project {number}',
+                description='description',
+                full_amount=full_amount,
+            ))
+        await session.commit()
+        donations = [
+            Donation(user_id=1, full_amount=full_amount)
+            for full_amount in (30, 150, 20, 400)
+        ]
+        session.add_all(donations)
+        await invest_many(allocated=donations, session=session)
+        await session.commit()
+        donations = await session.execute(
+            select(Donation.invested_amount, Donation.fully_invested)
+        )
+        projects = await session.execute(
+            select(CharityProject.invested_amount)
+        )
+        assert donations.all() == [
+            (30, True), (150, True), (20, True), (250, False)
+        ], 'Пачка пожертвований должна распределяться в порядке очереди.'
+        assert projects.scalars().all() == [100, 50, 300], (
+            'Пачка пожертвований должна распределяться в порядке очереди.'
+        )
+
+
+@pytest.mark.parametrize('investment_engine', ['python', 'sql'])
+async def test_investment_ledger(monkeypatch, investment_engine):
+    monkeypatch.setattr(settings, 'investment_engine', investment_engine)
+    async with TestingSessionLocal() as session:
+        for number, full_amount in enumerate((100, 50, 300)):
+            session.add(CharityProject(
+                name=f'project {number}',
+                description='description',
+                full_amount=full_amount,
+            ))
+        await session.commit()
+        donations = [
+            Donation(user_id=1, full_amount=full_amount)
+            for full_amount in (30, 150)
+        ]
+        session.add_all(donations)
+        await invest_many(allocated=donations, session=session)
+        donation = Donation(user_id=1, full_amount=400)
+        session.add(donation)
+        await invest(allocated=donation, session=session)
+        await session.commit()
+        investments = await session.execute(
+            select(
+                Investment.donation_id,
+                Investment.project_id,
+                Investment.amount
+            ).order_by(Investment.id)
+        )
+        assert investments.all() == [
+            (1, 1, 30), (2, 1, 70), (2, 2, 50), (2, 3, 30), (3, 3, 270)
+        ], 'Каждый перевод средств должен записываться в журнал.'
+        investments = await investment_crud.get_by_project(
+            project_id=3, session=session
+        )
+        assert [
+            (investment.donation_id, investment.amount)
+            for investment in investments
+        ] == [(2, 30), (3, 270)], (
+            'Журнал должен выдавать вложения в проект.'
+        )
+
+
+@pytest.mark.parametrize('investment_engine', ['python', 'sql'])
+async def test_invest_many_skips_closed(monkeypatch, investment_engine):
+    monkeypatch.setattr(settings, 'investment_engine', investment_engine)
+    monkeypatch.setattr(settings, 'investment_locking', True)
+    close_date = datetime(2020, 1, 1)
+    async with TestingSessionLocal() as session:
+        session.add(CharityProject(
+            name='project', description='description', full_amount=100
+        ))
+        closed = Donation(
+            user_id=1,
+            full_amount=30,
+            invested_amount=30,
+            fully_invested=True,
+            close_date=close_date,
+        )
+        session.add(closed)
+        await session.commit()
+        donation = Donation(user_id=1, full_amount=50)
+        session.add(donation)
+        await allocate(allocated=[closed, donation], session=session)
+        await invest_many(allocated=[closed, donation], session=session)
+        await session.commit()
+        investments = await session.execute(
+            select(
+                Investment.donation_id,
+                Investment.project_id,
+                Investment.amount
+            ).order_by(Investment.id)
+        )
+        assert investments.all() == [(2, 1, 50)], (
+            'Полностью распределенные объекты не должны попадать в '
+            'журнал распределения.'
+        )
+        await session.refresh(closed)
+        assert (closed.invested_amount, closed.close_date) == (
+            30, close_date
+        ), 'Дата закрытия распределенного объекта не должна меняться.'
+
+
+@pytest.mark.parametrize('investment_engine', ['python', 'sql'])
+async def test_concurrent_allocation_keeps_invariant(monkeypatch,
+                                                     investment_engine):
+    monkeypatch.setattr(settings, 'investment_engine', investment_engine)
+    monkeypatch.setattr(settings, 'investment_locking', True)
+    monkeypatch.setattr(settings, 'investment_retries', 50)
+    async with TestingSessionLocal() as session:
+        for number in range(5):
+            session.add(CharityProject(
+                name=f'project {number}',
+                description='description',
+                full_amount=100,
+            ))
+        await session.commit()
+
+    async def donate():
+        async with TestingSessionLocal() as session:
+            donation = Donation(user_id=1, full_amount=30)
+            session.add(donation)
+            await allocate(allocated=[donation], session=session)
+
+    await asyncio.gather(*(donate() for _ in range(20)))
+    async with TestingSessionLocal() as session:
+        projects = await session.execute(select(
+            func.sum(CharityProject.invested_amount),
+            func.sum(
+                CharityProject.full_amount - CharityProject.invested_amount
+            )
+        ))
+        donations = await session.execute(
+            select(func.sum(Donation.invested_amount))
+        )
+        invested_amount, remaining = projects.one()
+        assert remaining == 0, (
+            'При параллельных пожертвованиях все проекты должны быть '
+            'полностью проинвестированы.'
+        )
+        assert invested_amount == donations.scalar() == 500, (
+            'При параллельных пожертвованиях сумма вложений в проекты должна '
+            'совпадать с суммой распределенных пожертвований.'
+        )
+
+
+async def test_allocation_queue(monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    monkeypatch.setattr(settings, 'allocation_window', 0.5)
+    queue = AllocationQueue(session_factory=TestingSessionLocal)
+    await queue.start()
+    async with TestingSessionLocal() as session:
+        project = CharityProject(
+            name='project', description='description', full_amount=100
+        )
+        donations = [
+            Donation(user_id=1, full_amount=60),
+            Donation(user_id=1, full_amount=60),
+        ]
+        session.add(project)
+        project, = await queue.submit(allocated=[project], session=session)
+        assert project.allocation_state == AllocationState.PENDING, (
+            'До обработки очередью проект должен ожидать распределения.'
+        )
+        session.add_all(donations)
+        await queue.submit(allocated=donations, session=session)
+    await queue.join()
+    await queue.stop()
+    assert (queue.batches, queue.last_batch_size) == (1, 3), (
+        'Объекты, поступившие в пределах окна, должны распределяться '
+        'одной пачкой.'
+    )
+    async with TestingSessionLocal() as session:
+        project = await session.get(CharityProject, 1)
+        donations = await session.execute(
+            select(Donation).order_by(Donation.id)
+        )
+        donations = donations.scalars().all()
+        assert (project.invested_amount, project.fully_invested) == (
+            100, True
+        ), 'Очередь должна распределять средства в порядке поступления.'
+        assert [
+            (donation.invested_amount, donation.fully_invested)
+            for donation in donations
+        ] == [(60, True), (40, False)], (
+            'Очередь должна распределять средства в порядке поступления.'
+        )
+        assert all(
+            obj.allocation_state == AllocationState.ALLOCATED
+            for obj in (project, *donations)
+        ), 'После обработки очередью объекты должны быть распределены.'
+
+
+async def test_allocation_queue_retries_failed_batch(monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    monkeypatch.setattr(settings, 'allocation_window', 0.1)
+    monkeypatch.setattr(settings, 'allocation_retry_delay', 0.01)
+    queue = AllocationQueue(session_factory=TestingSessionLocal)
+    allocate_batch = queue.allocate_batch
+    attempts = []
+
+    async def failing_allocate_batch(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            raise RuntimeError('database is unavailable')
+        await allocate_batch(batch)
+
+    monkeypatch.setattr(queue, 'allocate_batch', failing_allocate_batch)
+    await queue.start()
+    async with TestingSessionLocal() as session:
+        project = CharityProject(
+            name='project', description='description', full_amount=100
+        )
+        donation = Donation(user_id=1, full_amount=60)
+        session.add_all((project, donation))
+        await queue.submit(allocated=[project, donation], session=session)
+    await asyncio.wait_for(queue.join(), 5)
+    await queue.stop()
+    assert len(attempts) == 2 and attempts[0] == attempts[1], (
+        'Пачка, распределение которой завершилось ошибкой, должна '
+        'повторно распределяться.'
+    )
+    assert (queue.failed_batches, queue.batches) == (1, 1), (
+        'Очередь должна учитывать пачки, распределение которых '
+        'завершилось ошибкой.'
+    )
+    async with TestingSessionLocal() as session:
+        project = await session.get(CharityProject, 1)
+        donation = await session.get(Donation, 1)
+        assert (project.invested_amount, donation.invested_amount) == (
+            60, 60
+        ), 'После повтора средства пачки должны быть распределены.'
+        assert not any(
+            obj.allocation_pending for obj in (project, donation)
+        ), 'После повтора объекты не должны оставаться в ожидании.'
+
+
+async def test_import_projects_cli_allocation_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    monkeypatch.setattr(import_projects, 'AsyncSessionLocal',
+                        TestingSessionLocal)
+    async with TestingSessionLocal() as session:
+        session.add(Donation(user_id=1, full_amount=60))
+        await session.commit()
+    path = tmp_path / 'projects.csv'
+    path.write_text(
+        'name,description,full_amount\n'
+        'first,First project,40\n'
+        'second,Second project,40\n',
+        encoding='utf-8'
+    )
+    await import_projects.main(path=path, import_format='csv', chunk_size=1)
+    async with TestingSessionLocal() as session:
+        projects = await session.execute(
+            select(CharityProject).order_by(CharityProject.id)
+        )
+        projects = projects.scalars().all()
+        donation = await session.get(Donation, 1)
+    assert [project.invested_amount for project in projects] == [40, 20], (
+        'Импорт из командной строки без запущенного воркера очереди '
+        'должен распределять средства сразу.'
+    )
+    assert not any(
+        obj.allocation_pending for obj in (*projects, donation)
+    ), (
+        'Импорт из командной строки без запущенного воркера очереди '
+        'не должен оставлять объекты в ожидании распределения.'
+    )
+
+
+async def test_open_pool_index(monkeypatch):
+    monkeypatch.setattr(settings, 'investment_engine', 'python')
+    monkeypatch.setattr(settings, 'open_pool_index', True)
+    monkeypatch.setattr(open_pool_index, 'pools', {
+        CharityProject: OpenPool(),
+        Donation: OpenPool(),
+    })
+    pool = open_pool_index.pools[CharityProject]
+    async with TestingSessionLocal() as session:
+        for number in range(3):
+            session.add(CharityProject(
+                name=f'project {number}',
+                description='description',
+                full_amount=100,
+            ))
+        await session.commit()
+        await open_pool_index.load(session)
+        donation = Donation(user_id=1, full_amount=60)
+        session.add(donation)
+        await invest(allocated=donation, session=session)
+        await session.commit()
+        assert (list(pool.ids), list(pool.remaining)) == (
+            [1, 2, 3], [40, 100, 100]
+        ), 'Индекс открытых проектов должен обновляться после распределения.'
+        await session.execute(
+            update(CharityProject).where(CharityProject.id == 1).values(
+                invested_amount=100, fully_invested=True
+            )
+        )
+        await session.commit()
+        rebuilds = open_pool_index.rebuilds
+        donation = Donation(user_id=1, full_amount=150)
+        session.add(donation)
+        await invest(allocated=donation, session=session)
+        await session.commit()
+        assert open_pool_index.rebuilds > rebuilds, (
+            'При расхождении с БД индекс должен перестраиваться.'
+        )
+        assert (list(pool.ids), list(pool.remaining)) == ([3], [50]), (
+            'После перестроения индекс должен совпадать с БД.'
+        )
+        assert pool.total == 50, (
+            'После перестроения суммарный остаток индекса должен '
+            'совпадать с БД.'
+        )
+        await session.refresh(donation)
+        assert (donation.invested_amount, donation.fully_invested) == (
+            150, True
+        ), 'После перестроения индекса средства должны распределяться.'
+        rebuilds = open_pool_index.rebuilds
+        donation = Donation(user_id=1, full_amount=100)
+        session.add(donation)
+        await invest(allocated=donation, session=session)
+        await session.commit()
+        assert open_pool_index.rebuilds == rebuilds, (
+            'Если индекс совпадает с БД, он не должен перестраиваться.'
+        )
+        assert (list(pool.ids), pool.total) == ([], 0), (
+            'Закрытые проекты должны удаляться из индекса.'
+        )
+
+
+async def test_open_pool_index_finds_external_rows(monkeypatch):
+    monkeypatch.setattr(settings, 'investment_engine', 'python')
+    monkeypatch.setattr(settings, 'open_pool_index', True)
+    monkeypatch.setattr(open_pool_index, 'pools', {
+        CharityProject: OpenPool(),
+        Donation: OpenPool(),
+    })
+    pool = open_pool_index.pools[CharityProject]
+    async with TestingSessionLocal() as session:
+        await open_pool_index.load(session)
+    # Проект создается другим процессом в обход индекса.
+    async with TestingSessionLocal() as session:
+        await session.execute(insert(CharityProject).values(
+            name='project',
+            description='description',
+            full_amount=100,
+            invested_amount=0,
+            fully_invested=False,
+            allocation_pending=False,
+            create_date=datetime.now(),
+        ))
+        await session.commit()
+    assert len(pool) == 0
+    async with TestingSessionLocal() as session:
+        donation = Donation(user_id=1, full_amount=50)
+        session.add(donation)
+        await invest(allocated=donation, session=session)
+        await session.commit()
+        await session.refresh(donation)
+        project = await session.get(CharityProject, 1)
+    assert (donation.invested_amount, project.invested_amount) == (50, 50), (
+        'Индекс должен находить проекты, открытые в обход индекса.'
+    )
+    assert (list(pool.ids), pool.total) == ([1], 50), (
+        'После сверки с БД индекс должен содержать открытые проекты.'
+    )
+
+
+def test_open_pool_order_and_total():
+    pool = OpenPool()
+    first, second = datetime(2026, 1, 1), datetime(2026, 1, 2)
+    pool.fill([(1, first, 10), (4, second, 20)])
+    pool.put(3, second, 30)
+    pool.put(2, first, 40)
+    pool.put(5, second, 50)
+    assert list(pool.ids) == [1, 2, 3, 4, 5], (
+        'Объекты пула должны упорядочиваться по дате создания и id.'
+    )
+    pool.put(3, second, 5)
+    pool.discard(4, second)
+    pool.discard(2, second)
+    assert (list(pool.ids), list(pool.remaining)) == (
+        [1, 2, 3, 5], [10, 40, 5, 50]
+    ), 'Пул должен находить объекты по дате создания и id.'
+    assert pool.total == sum(pool.remaining) == 105, (
+        'Суммарный остаток пула должен обновляться при каждом изменении.'
+    )
+
+
+async def test_replay_restores_allocation():
+    async with TestingSessionLocal() as session:
+        for number, (model, full_amount) in enumerate((
+            (CharityProject, 100), (Donation, 30), (Donation, 150),
+            (CharityProject, 50), (Donation, 20), (CharityProject, 300),
+            (Donation, 400), (CharityProject, 10),
+        )):
+            if model is Donation:
+                obj = Donation(user_id=1, full_amount=full_amount)
+            else:
+                obj = CharityProject(
+                    name=f'project {number}',
+                    description='description',
+                    full_amount=full_amount,
+                )
+            session.add(obj)
+            await invest(allocated=obj, session=session)
+            await session.commit()
+
+        async def get_state():
+            state = []
+            for model in (Donation, CharityProject):
+                rows = await session.execute(
+                    select(
+                        model.id, model.invested_amount, model.fully_invested
+                    ).order_by(model.id)
+                )
+                state.append(rows.all())
+            rows = await session.execute(
+                select(
+                    Investment.donation_id,
+                    Investment.project_id,
+                    Investment.amount
+                )
+            )
+            state.append(sorted(rows.all()))
+            return state
+
+        expected = await get_state()
+        await session.execute(update(Donation).values(
+            invested_amount=0, fully_invested=False, close_date=None
+        ))
+        await session.execute(
+            update(CharityProject).where(CharityProject.id == 1).values(
+                invested_amount=0, fully_invested=False, close_date=None
+            )
+        )
+        await session.execute(delete(Investment))
+        await session.commit()
+        report = await replay(session=session, chunk_size=2, dry_run=True)
+        assert (
+            report['donations'].changed,
+            report['donations'].delta,
+            report['projects'].changed,
+            report['projects'].delta,
+        ) == (4, 460, 1, 100), (
+            'Пробный пересчет должен сообщать о расхождениях с текущими '
+            'данными.'
+        )
+        assert await get_state() != expected, (
+            'Пробный пересчет не должен сохранять изменения.'
+        )
+        await replay(session=session, chunk_size=2)
+        assert await get_state() == expected, (
+            'Пересчет должен восстанавливать распределение средств '
+            'и журнал распределения.'
+        )
+        closed = await session.execute(
+            select(func.count()).where(
+                Donation.fully_invested, Donation.close_date.is_(None)
+            )
+        )
+        assert not closed.scalar(), (
+            'Пересчет должен проставлять даты закрытия.'
+        )
+
+
+@pytest.mark.parametrize('investment_engine', ['python', 'sql'])
+def test_donation_statements_do_not_grow(monkeypatch, user_client, mixer,
+                                         investment_engine):
+    monkeypatch.setattr(settings, 'investment_engine', investment_engine)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    counts = []
+    for projects in (2, 10):
+        for number in range(projects):
+            mixer.blend(
+                'app.models.charity_project.CharityProject',
+                name=f'project {projects}-{number}',
+                description='description',
+                full_amount=10,
+                invested_amount=0,
+                fully_invested=False,
+                close_date=None,
+                allocation_pending=False,
+                version=1,
+                create_date=datetime.now(),
+            )
+        statements.clear()
+        event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            response = user_client.post(
+                '/donation/', json={'full_amount': projects * 10}
+            )
+        finally:
+            event.remove(
+                engine.sync_engine, 'before_cursor_execute', capture
+            )
+        assert response.status_code == 200
+        counts.append(len(statements))
+    assert counts[0] == counts[1], (
+        'Количество запросов к БД при создании пожертвования не должно '
+        'зависеть от количества затронутых проектов.'
+    )